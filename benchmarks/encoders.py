@@ -0,0 +1,132 @@
+"""
+Encoders for the game's file formats, used to write benchmark and test assets
+"""
+import struct
+import msgpack
+
+
+def pack_keyed(data, filename):
+    """
+    Write data in the game's key-table msgpack format.
+    """
+    keys = []
+    index = {}
+
+    def encode(value):
+        if isinstance(value, dict):
+            encoded = {}
+            for key, element in value.items():
+                if key not in index:
+                    index[key] = len(keys)
+                    keys.append(key.encode('utf-8'))
+                encoded[index[key]] = encode(element)
+            return encoded
+        if isinstance(value, list):
+            return [encode(element) for element in value]
+        if isinstance(value, str):
+            return value.encode('utf-8')
+        return value
+
+    with open(filename, 'wb') as outfile:
+        msgpack.pack([encode(data), keys], outfile, use_bin_type=False)
+
+
+def _pack_bits(fields):
+    """
+    Pack (value, bit_length) fields, least significant bit first.
+    """
+    bits = ''.join(format(value, '0{}b'.format(length))[::-1] for value, length in fields)
+    if not bits:
+        return b''
+    return int(bits[::-1], 2).to_bytes((len(bits) + 7) // 8, 'little')
+
+
+def _varlen(value):
+    """
+    Get the bit fields of a variable-length integer.
+    """
+    if value < 8:
+        return [(0, 1), (value, 3)]
+    if value < 64:
+        return [(1, 2), (value, 6)]
+    if value < 1024:
+        return [(3, 2), (value, 10)]
+    raise ValueError('{} is too large for a variable-length integer'.format(value))
+
+
+def encode_string_table(names, offset):
+    """
+    Encode names as a bit-packed StringTable starting at offset in the file.
+
+    Each name is a list of indexes into a table of distinct words, so a table
+    can hold at most 1024 distinct words.
+    """
+    words = []
+    word_ids = {}
+    encodings = []
+    for name in names:
+        name_words = name.split(' ') if name else []
+        fields = _varlen(len(name_words))
+        for word in name_words:
+            if word not in word_ids:
+                word_ids[word] = len(words)
+                words.append(word.encode('iso8859-1'))
+            fields.extend(_varlen(word_ids[word]))
+        encodings.append(_pack_bits(fields))
+
+    encoding_offsets = []
+    encoding_data = b''
+    for encoding in encodings:
+        encoding_offsets.append(len(encoding_data))
+        encoding_data += encoding
+    bit_length = max(1, max(encoding_offsets or [0]).bit_length())
+    encoding_index = _pack_bits((value, bit_length) for value in encoding_offsets)
+
+    word_offsets = [0]
+    for word in words:
+        word_offsets.append(word_offsets[-1] + len(word))
+    word_bit_length = max(1, word_offsets[-1].bit_length())
+    word_index = bytes([word_bit_length]) + _pack_bits((value, word_bit_length)
+                                                       for value in word_offsets)
+
+    # Every packed section is padded so 32-bit reads never run off its end.
+    padding = b'\0' * 4
+    encodings_offset = offset + 13 + len(encoding_index) + len(padding)
+    word_index_offset = encodings_offset + len(encoding_data) + len(padding)
+    words_offset = word_index_offset + len(word_index) + len(padding)
+    return b''.join([struct.pack('<IIIB', encodings_offset, word_index_offset, words_offset,
+                                 bit_length),
+                     encoding_index, padding,
+                     encoding_data, padding,
+                     word_index, padding,
+                     b''.join(words), padding])
+
+
+def encode_itemcolorstrings(items, metal_count, languages):
+    """
+    Encode an itemcolorstrings.dat file.
+
+    items is a list of (item_id, subtitle_index) pairs and languages maps each
+    language name to its 'subtitles', 'colours', 'metals' and 'items' names.
+    """
+    header = struct.pack('<BH', metal_count, len(items))
+    header += b''.join(struct.pack('<HB', item_id, subtitle) for item_id, subtitle in items)
+    header += struct.pack('<B', len(languages))
+    offset = len(header) + sum(1 + len(name) + 4 for name in languages)
+
+    body = b''
+    for name, tables in languages.items():
+        language_offset = offset + len(body)
+        header += struct.pack('<B', len(name)) + name.encode('iso8859-1')
+        header += struct.pack('<I', language_offset)
+
+        subtitles = encode_string_table(tables['subtitles'], language_offset + 12)
+        colour_offset = language_offset + 12 + len(subtitles)
+        colours = encode_string_table(tables['colours'], colour_offset)
+        metal_offset = colour_offset + len(colours)
+        metals = encode_string_table(tables['metals'], metal_offset)
+        item_offset = metal_offset + len(metals)
+        item_names = encode_string_table(tables['items'], item_offset)
+        body += b''.join([struct.pack('<III', colour_offset, metal_offset, item_offset),
+                          subtitles, colours, metals, item_names])
+    return header + body
@@ -0,0 +1,358 @@
+"""
+Generate a synthetic set of game assets
+
+Writes every file the load and extract commands read, in the game's formats,
+with a catalogue of roughly the real game's size multiplied by a scale:
+
+    archetypes/compileditems.msgpack   archetypes/compiledblocks.msgpack
+    archetypes/recipes.msgpack         archetypes/resourcetags.json
+    attributes/attributes.msgpack      lang/english.json
+    lang/english.msgpack               lang/itemcolorstrings.dat
+    gui/atlas.png                      gui/atlas.msgpack
+
+Generation is deterministic for a given scale and seed.
+
+    $ python -m benchmarks.fixtures --scale 10 /tmp/assets
+"""
+import argparse
+import json
+import math
+import os
+import random
+from PIL import Image, ImageDraw
+from benchmarks.encoders import encode_itemcolorstrings, pack_keyed
+
+
+# Roughly the size of the real catalogue at scale 1.  The item table of
+# itemcolorstrings.dat holds at most 65535 items, which bounds the scale.
+ITEM_COUNT = 600
+STRING_COUNT = 4000
+ICON_COUNT = 300
+ICON_SIZE = 32
+
+# Share of the items that are raw materials, with no recipe
+RAW_SHARE = 0.15
+
+LANGUAGES = ['english', 'french', 'german', 'spanish']
+
+MACHINES = ['CRAFTING_TABLE', 'WORKBENCH', 'EXTRACTOR', 'COMPACTOR', 'REFINERY', 'MIXER',
+            'FORGE', 'FURNACE', 'POWERCORE', 'HELIX', 'DYE_MAKER']
+
+QUANTITIES = ['GUI_MACHINE_CRAFT_TAB_SINGLE', 'GUI_MACHINE_CRAFT_TAB_BULK',
+              'GUI_MACHINE_CRAFT_TAB_MASS']
+
+SYLLABLES = ['ba', 'bor', 'ca', 'del', 'dro', 'el', 'fen', 'gar', 'gle', 'ha', 'im', 'ka',
+             'lor', 'lum', 'ma', 'nor', 'o', 'pe', 'quar', 'ri', 'sa', 'sto', 'ta', 'tor',
+             'u', 'va', 'wo', 'xi', 'ya', 'zen']
+
+
+class _Generator(object):  # pylint: disable=too-few-public-methods
+    """
+    Build and write a synthetic catalogue.
+    """
+
+    def __init__(self, scale, seed):
+        self._rng = random.Random(seed)
+        self.item_count = ITEM_COUNT * scale
+        if self.item_count > 0xffff - 1000:
+            raise ValueError('scale {} exceeds the itemcolorstrings.dat item limit'.format(scale))
+        self.scale = scale
+        self.item_ids = [1000 + i for i in range(self.item_count)]
+        self.raw_count = max(1, int(self.item_count * RAW_SHARE))
+        self.subtitle_count = 40
+        self.metal_count = 12
+
+    def _vocabulary(self, count):
+        """
+        Get count distinct made-up capitalized words.
+        """
+        words = set()
+        while len(words) < count:
+            word = ''.join(self._rng.choice(SYLLABLES)
+                           for _ in range(self._rng.randint(1, 3)))
+            words.add(word.capitalize())
+        return sorted(words)
+
+    def _names(self, count):
+        """
+        Get count distinct two-word names built from fewer than 1024 words.
+        """
+        side = max(2, math.ceil(math.sqrt(count)))
+        first, second = self._vocabulary(side), self._vocabulary(side)
+        return ['{} {}'.format(first[i // side], second[i % side]) for i in range(count)]
+
+    def itemcolorstrings(self):
+        """
+        Get the itemcolorstrings.dat contents, and the English item names.
+        """
+        items = [(item_id, self._rng.randrange(self.subtitle_count)) for item_id in self.item_ids]
+        items[0] = (items[0][0], self.subtitle_count - 1)
+        languages = {}
+        for language in LANGUAGES:
+            languages[language] = {
+                'subtitles': [' '.join(self._vocabulary(self._rng.randint(1, 2)))
+                              for _ in range(self.subtitle_count)],
+                'colours': self._names(255),
+                'metals': self._names(self.metal_count),
+                'items': self._names(self.item_count),
+            }
+        data = encode_itemcolorstrings(items, self.metal_count, languages)
+        return data, languages['english']['items']
+
+    def items(self):
+        """
+        Get the compileditems.msgpack contents.
+        """
+        items = {}
+        for item_id in self.item_ids:
+            name = 'ITEM_{}'.format(item_id)
+            items[name] = {'id': item_id,
+                           'name': name,
+                           'stringID': 'ITEM_TYPE_{}'.format(item_id),
+                           'coinValue': self._rng.randrange(1000),
+                           'listTypeName': 'LIST_TYPE_{}'.format(self._rng.randrange(40)),
+                           'maxStackSize': 100,
+                           'canDrop': True,
+                           'tags': ['TAG_{}'.format(self._rng.randrange(20))]}
+        return items
+
+    def blocks(self):
+        """
+        Get the compiledblocks.msgpack contents: a block for some of the items,
+        with unused block slots left empty.
+        """
+        blocks = []
+        for item_id in self.item_ids:
+            if self._rng.random() < 0.4:
+                blocks.append({'id': item_id,
+                               'prestige': self._rng.randrange(500),
+                               'buildXP': self._rng.randrange(20),
+                               'mineXP': self._rng.randrange(20)})
+            elif self._rng.random() < 0.1:
+                blocks.append(None)
+        return {'BlockTypesData': blocks}
+
+    def recipes(self):
+        """
+        Get the recipes.msgpack contents.
+
+        Ingredients are always earlier items, so the recipes form a DAG whose
+        leaves are the raw materials; groups are alternatives among those.
+        """
+        raw_ids = self.item_ids[:self.raw_count]
+        groups = []
+        for i in range(max(1, self.raw_count // 10)):
+            groups.append({'groupName': 'GROUP_{}'.format(i),
+                           'groupMembers': self._rng.sample(raw_ids, min(6, len(raw_ids)))})
+
+        def triple(base):
+            return [base, base * 9, base * 90]
+
+        recipes = []
+        for position in range(self.raw_count, self.item_count):
+            for _ in range(1 if self._rng.random() < 0.9 else 2):
+                machine = self._rng.choice(MACHINES)
+                recipe = {'outputItem': self.item_ids[position],
+                          'outputQuantity': triple(self._rng.randint(1, 4)),
+                          'craftXP': self._rng.randrange(50),
+                          'machine': machine,
+                          'spark': triple(self._rng.randrange(0, 200, 10)),
+                          'wear': triple(self._rng.randrange(5)),
+                          'duration': triple(self._rng.randint(1, 300)),
+                          'powerRequired': self._rng.randrange(3),
+                          'inputs': [],
+                          'prerequisites': [{'attribute': 'Crafting Level',
+                                             'level': self._rng.randint(1, 10)}]}
+                if machine == 'FURNACE':
+                    recipe['heat'] = self._rng.randrange(1, 30)
+                if machine == 'CRAFTING_TABLE':
+                    recipe['canHandCraft'] = True
+                sources = self._rng.sample(self.item_ids[:position],
+                                           min(position, self._rng.randint(1, 4)))
+                for source in sources:
+                    recipe['inputs'].append({'inputItems': [source],
+                                             'inputQuantity': triple(self._rng.randint(1, 8))})
+                if self._rng.random() < 0.3:
+                    recipe['inputs'].append({'groupId': self._rng.choice(groups)['groupName'],
+                                             'inputQuantity': triple(self._rng.randint(1, 8))})
+                recipes.append(recipe)
+        return {'groups': groups, 'recipes': recipes}
+
+    def translations(self):
+        """
+        Get the english.json and english.msgpack contents.
+        """
+        strings = {key: key.split('_')[-1].capitalize() for key in QUANTITIES}
+        for machine in MACHINES:
+            strings['GUI_MACHINE_{}_TITLE'.format(machine)] = machine.replace('_', ' ').title()
+        strings['GUI_CRAFTING_TABLE_TITLE'] = 'Crafting Table'
+        strings['GUI_DYE_MAKER_TITLE'] = 'Dye Maker'
+        for i in range(40):
+            strings['LIST_TYPE_{}'.format(i)] = ' '.join(self._vocabulary(2))
+        for item_id in self.item_ids:
+            strings['ITEM_TYPE_{}_DESCRIPTION'.format(item_id)] = \
+                'A $[STYLE({},1)] of {} quality.'.format(*self._vocabulary(2))
+        strings['GUI_VERSION'] = 249
+
+        packed = {}
+        for i in range(STRING_COUNT * self.scale):
+            packed['GUI_STRING_{}'.format(i)] = ' '.join(self._vocabulary(self._rng.randint(1, 6)))
+        return strings, packed
+
+    def resource_tags(self):
+        """
+        Get the resourcetags.json contents for the raw materials.
+        """
+        levels = ['LOW', 'MEDIUM', 'HIGH', 'ANY']
+        return {'ITEM_TYPE_{}'.format(item_id): {
+            'foundAltitude': '{}_ALTITUDE'.format(self._rng.choice(levels)),
+            'foundDepth': '{}_DEPTH'.format(self._rng.choice(levels)),
+            'foundMaterial': 'ROCK_{}'.format(self._rng.randrange(10))}
+                for item_id in self.item_ids[:self.raw_count]}
+
+    def attributes(self):
+        """
+        Get the attributes.msgpack contents.
+        """
+        count = 50 * self.scale
+        modifiers = {'MOD_{}'.format(i): {'value': self._rng.randrange(100) / 10,
+                                          'order': self._rng.randrange(5),
+                                          'type': self._rng.choice(['add', 'multiply'])}
+                     for i in range(count)}
+        bundles = {}
+        for i in range(count):
+            bundle = {'target': 'player',
+                      'duration': self._rng.randrange(600),
+                      'stackable': self._rng.random() < 0.5}
+            if i < 10 or self._rng.random() < 0.7:
+                bundle['modifiers'] = ['MOD_{}'.format(self._rng.randrange(count))]
+            else:
+                bundle['bundles'] = ['BUNDLE_{}'.format(self._rng.randrange(10))
+                                     for _ in range(self._rng.randint(1, 3))]
+            bundles['BUNDLE_{}'.format(i)] = bundle
+        archetypes = {'TARGET_{}'.format(i): {'attributes': {
+            'ATTR_{}'.format(j): {'calculation': 'sum',
+                                  'category': 'CATEGORY_{}'.format(j % 4),
+                                  'min': 0,
+                                  'max': self._rng.randrange(1, 1000)}
+            for j in range(10)}} for i in range(self.scale * 5)}
+        return {'constants': {'CONST_{}'.format(i): self._rng.randrange(1000)
+                              for i in range(count)},
+                'modifiers': modifiers,
+                'bundles': bundles,
+                'archetypes': archetypes}
+
+    def atlas(self):
+        """
+        Get the texture atlas and its index.
+
+        Each cell holds a different grey-scale icon in each RGB channel.  A few
+        icons are variants sharing their cell with another icon, and some
+        sprites are not icons at all.
+        """
+        icon_count = ICON_COUNT * self.scale
+        cells = math.ceil(icon_count / 3)
+        columns = math.ceil(math.sqrt(cells))
+        rows = math.ceil(cells / columns)
+        bands = [Image.new('L', (columns * ICON_SIZE, rows * ICON_SIZE)) for _ in range(3)]
+        for band in bands:
+            draw = ImageDraw.Draw(band)
+            for cell in range(cells):
+                left = (cell % columns) * ICON_SIZE
+                top = (cell // columns) * ICON_SIZE
+                inset = self._rng.randrange(2, ICON_SIZE // 4)
+                draw.ellipse((left + inset, top + inset,
+                              left + ICON_SIZE - inset, top + ICON_SIZE - inset),
+                             fill=self._rng.randrange(64, 256))
+                draw.rectangle((left + ICON_SIZE // 3, top + ICON_SIZE // 3,
+                                left + ICON_SIZE // 2, top + ICON_SIZE // 2),
+                               fill=self._rng.randrange(256))
+
+        categories = ['items', 'blocks', 'tools']
+        sprites = []
+        for i in range(icon_count):
+            cell = i // 3
+            uvs = [(cell % columns) * ICON_SIZE, (cell // columns) * ICON_SIZE,
+                   ICON_SIZE, ICON_SIZE]
+            name = 'gui/icons/{}/ITEM_{}.png'.format(categories[i % 3],
+                                                     self.item_ids[i % self.item_count])
+            sprites.append({'name': name, 'uvs': uvs, 'channel': i % 3})
+            if i % 20 == 0:
+                sprites.append({'name': name.replace('.png', '_VARIANT.png'),
+                                'uvs': uvs, 'channel': i % 3})
+            if i % 50 == 0:
+                sprites.append({'name': 'gui/cursors/CURSOR_{}.png'.format(i),
+                                'uvs': uvs, 'channel': i % 3})
+        return Image.merge('RGB', bands), {'sprites': sprites}
+
+
+def archetypes(scale=1, seed=249):
+    """
+    Get the compileditems.msgpack and recipes.msgpack contents at scale times
+    the real catalogue size, without writing anything.
+    """
+    generator = _Generator(scale, seed)
+    return generator.items(), generator.recipes()
+
+
+def generate(assetdir, scale=1, seed=249):
+    """
+    Write a synthetic asset tree at scale times the real catalogue size.
+
+    Returns a summary of what was written, including the English names of the
+    crafted items.
+    """
+    generator = _Generator(scale, seed)
+    for folder in ('archetypes', 'attributes', 'lang', 'gui'):
+        os.makedirs(os.path.join(assetdir, folder), exist_ok=True)
+
+    def path(*names):
+        return os.path.join(assetdir, *names)
+
+    data, names = generator.itemcolorstrings()
+    with open(path('lang', 'itemcolorstrings.dat'), 'wb') as outfile:
+        outfile.write(data)
+    strings, packed_strings = generator.translations()
+    with open(path('lang', 'english.json'), 'w') as outfile:
+        json.dump(strings, outfile)
+    pack_keyed(packed_strings, path('lang', 'english.msgpack'))
+    pack_keyed(generator.attributes(), path('attributes', 'attributes.msgpack'))
+    with open(path('archetypes', 'resourcetags.json'), 'w') as outfile:
+        json.dump(generator.resource_tags(), outfile)
+    pack_keyed(generator.items(), path('archetypes', 'compileditems.msgpack'))
+    pack_keyed(generator.blocks(), path('archetypes', 'compiledblocks.msgpack'))
+    recipes = generator.recipes()
+    pack_keyed(recipes, path('archetypes', 'recipes.msgpack'))
+    atlas, atlas_index = generator.atlas()
+    atlas.save(path('gui', 'atlas.png'))
+    pack_keyed(atlas_index, path('gui', 'atlas.msgpack'))
+
+    crafted = {recipe['outputItem'] for recipe in recipes['recipes']}
+    return {
+        'scale': scale,
+        'items': generator.item_count,
+        'recipes': len(recipes['recipes']),
+        'icons': len(atlas_index['sprites']),
+        'crafted_names': [name for item_id, name in zip(generator.item_ids, names)
+                          if item_id in crafted],
+    }
+
+
+def main():
+    """
+    Write a synthetic asset tree.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiple of the real catalogue size')
+    parser.add_argument('--seed', type=int, default=249,
+                        help='random seed')
+    parser.add_argument('assetdir',
+                        help='folder to write the assets to')
+    args = parser.parse_args()
+    summary = generate(args.assetdir, args.scale, args.seed)
+    print('{items} items, {recipes} recipes, {icons} sprites'.format(**summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark decoding of the game's key-table msgpack files
+
+Compares the original recursive transform against blrecipe.clt.msgpackfile on
+the synthetic compileditems.msgpack and recipes.msgpack of benchmarks.fixtures,
+reporting the decode time and tracemalloc peak for each.
+
+    $ python -m benchmarks.msgpack_decode --scale 10
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import msgpack
+from blrecipe.clt import msgpackfile
+from benchmarks.fixtures import ITEM_COUNT, archetypes, pack_keyed
+
+
+def _legacy_transform(keys, data):
+    """
+    The recursive transform this benchmark measures against.
+    """
+    if isinstance(data, bytes):
+        return data.decode('utf-8')
+    elif isinstance(data, list):
+        return [_legacy_transform(keys, element) for element in data]
+    elif isinstance(data, dict):
+        return {keys[int(key)].decode('utf-8'): _legacy_transform(keys, value)
+                for key, value in data.items()}
+    return data
+
+
+def _legacy_unpack(filename):
+    with open(filename, 'rb') as infile:
+        unpacked = msgpack.unpack(infile, raw=True, strict_map_key=False)
+        return _legacy_transform(unpacked[1], unpacked[0])
+
+
+def _measure(decode, filename):
+    """
+    Time a decode, then repeat it under tracemalloc to find its peak memory.
+    """
+    start = time.perf_counter()
+    decode(filename)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    decode(filename)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def _consume(iterator):
+    for _ in iterator:
+        pass
+
+
+def main():
+    """
+    Run the benchmark and print a result table.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiple of the real catalogue size ({} items)'.format(ITEM_COUNT))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        items_file = os.path.join(tmpdir, 'compileditems.msgpack')
+        recipes_file = os.path.join(tmpdir, 'recipes.msgpack')
+        items, recipes = archetypes(args.scale)
+        pack_keyed(items, items_file)
+        pack_keyed(recipes, recipes_file)
+
+        cases = [
+            ('compileditems legacy', _legacy_unpack, items_file),
+            ('compileditems unpack', msgpackfile.unpack, items_file),
+            ('compileditems iter_map', lambda f: _consume(msgpackfile.iter_map(f)), items_file),
+            ('recipes legacy', _legacy_unpack, recipes_file),
+            ('recipes unpack', msgpackfile.unpack, recipes_file),
+            ('recipes iter_array', lambda f: _consume(msgpackfile.iter_array(f, 'recipes')),
+             recipes_file),
+        ]
+        print('{:<24} {:>10} {:>12}'.format('case', 'seconds', 'peak KiB'))
+        for name, decode, filename in cases:
+            elapsed, peak = _measure(decode, filename)
+            print('{:<24} {:>10.4f} {:>12.0f}'.format(name, elapsed, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
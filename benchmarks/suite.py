@@ -0,0 +1,245 @@
+"""
+Benchmark loading, recipe printing and icon extraction
+
+Generates synthetic assets at each requested scale (see benchmarks.fixtures)
+and times, in a scratch folder:
+
+    load               Loader.load_files into a new database
+    reload             Loader.load_files again, with every file unchanged
+    recipe             print_recipe with an infobox for a sample of items
+    recipe-snapshot    the same, rendered from a CatalogSnapshot loaded once
+    tree               the raw materials of every item in every quantity tier
+    extract            Extractor.extract into a new folder
+    extract-unchanged  Extractor.extract again, with every icon unchanged
+
+Results are written as JSON and can be compared with an earlier run.
+
+    $ python -m benchmarks.suite --scale 1 --scale 10 --output after.json --compare before.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from blrecipe.clt.extract import Extractor
+from blrecipe.clt.load import Loader
+from blrecipe.clt.recipe import print_item_wiki, print_recipe
+from blrecipe.storage import CatalogSnapshot, CraftingTrees, Database, QUANTITY_TIERS
+from benchmarks import fixtures
+
+
+CASES = ['load', 'reload', 'recipe', 'recipe-snapshot', 'tree', 'extract',
+         'extract-unchanged']
+
+# Number of items whose recipe is printed in the recipe case
+RECIPE_SAMPLE = 50
+
+# Where the commands write, relative to the scratch folder
+DATABASE = 'blrecipe.db'
+ICONS = 'icons'
+
+
+def _load(assetdir, report):
+    """
+    Load the assets into the database in the current folder.
+    """
+    args = argparse.Namespace(assetdir=assetdir, release='benchmark', asset_index=None,
+                              report=report, trace_memory=False, jobs=None,
+                              database=None, db_profile=None)
+    with contextlib.redirect_stderr(io.StringIO()):
+        Loader(args).load_files()
+
+
+def _print_recipes(names):
+    """
+    Print the recipe and infobox of each named item.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in names:
+            print_recipe(argparse.Namespace(item_name=name, print_infobox=True,
+                                            database=None, db_profile=None))
+
+
+def _print_snapshot_recipes(names):
+    """
+    Print the recipe and infobox of each named item from a snapshot.
+    """
+    database = Database()
+    snapshot = CatalogSnapshot(database.session())
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name in names:
+            item = snapshot.item_named(name)
+            print_item_wiki(item, snapshot.resource_tag(item.string_id), print_infobox=True)
+    database.close()
+
+
+def _expand_all(snapshot):
+    """
+    Expand every item into its raw materials in every quantity tier.
+    """
+    for quantity_id in QUANTITY_TIERS.values():
+        trees = CraftingTrees(snapshot, quantity_id)
+        for item in snapshot.items.values():
+            trees.raw_materials(item)
+
+
+def _extract(assetdir, jobs):
+    """
+    Extract the icons into the current folder.
+    """
+    args = argparse.Namespace(assetdir=assetdir, jobs=jobs, sharpen_atlas=False, force=False,
+                              cache=None, sizes=None, webp=False, dedup=False)
+    Extractor(args).extract(outdir=ICONS)
+
+
+def _remove(path):
+    """
+    Remove a file or folder left by an earlier run.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _time(run, repeat, setup=None):
+    """
+    Time repeat runs of a case, calling setup untimed before each.
+    """
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def run_scale(scale, cases=None, repeat=1, jobs=1):
+    """
+    Generate assets at a scale and time the benchmark cases against them.
+
+    Returns a result dict for each case run.
+    """
+    cases = CASES if cases is None else cases
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assetdir = os.path.join(tmpdir, 'assets')
+        summary = fixtures.generate(assetdir, scale)
+        workdir = os.path.join(tmpdir, 'work')
+        os.makedirs(workdir)
+        report = os.path.join(tmpdir, 'report.json')
+        names = summary['crafted_names']
+        sample = names[::max(1, len(names) // RECIPE_SAMPLE)][:RECIPE_SAMPLE]
+
+        def record(case, runs, **extra):
+            result = {'scale': scale, 'case': case, 'seconds': min(runs), 'runs': runs}
+            result.update(extra)
+            results.append(result)
+            print('{:>5}x {:<18} {:>10.4f}'.format(scale, case, result['seconds']))
+
+        def load_phases():
+            with open(report) as infile:
+                return json.load(infile)['phases']
+
+        os.chdir(workdir)
+        try:
+            if {'load', 'reload', 'recipe', 'recipe-snapshot', 'tree'}.intersection(cases):
+                runs = _time(lambda: _load(assetdir, report), repeat if 'load' in cases else 1,
+                             setup=lambda: _remove(DATABASE))
+                if 'load' in cases:
+                    record('load', runs, items=summary['items'], recipes=summary['recipes'],
+                           phases=load_phases())
+            if 'reload' in cases:
+                record('reload', _time(lambda: _load(assetdir, report), repeat),
+                       phases=load_phases())
+            if 'recipe' in cases:
+                runs = _time(lambda: _print_recipes(sample), repeat)
+                record('recipe', runs, items=len(sample),
+                       seconds_per_item=min(runs) / max(1, len(sample)))
+            if 'recipe-snapshot' in cases:
+                runs = _time(lambda: _print_snapshot_recipes(sample), repeat)
+                record('recipe-snapshot', runs, items=len(sample),
+                       seconds_per_item=min(runs) / max(1, len(sample)))
+            if 'tree' in cases:
+                database = Database()
+                snapshot = CatalogSnapshot(database.session())
+                record('tree', _time(lambda: _expand_all(snapshot), repeat),
+                       items=len(snapshot.items), tiers=len(QUANTITY_TIERS))
+                database.close()
+            if 'extract' in cases or 'extract-unchanged' in cases:
+                runs = _time(lambda: _extract(assetdir, jobs),
+                             repeat if 'extract' in cases else 1,
+                             setup=lambda: _remove(ICONS))
+                if 'extract' in cases:
+                    record('extract', runs, sprites=summary['icons'], jobs=jobs)
+            if 'extract-unchanged' in cases:
+                record('extract-unchanged', _time(lambda: _extract(assetdir, jobs), repeat),
+                       sprites=summary['icons'], jobs=jobs)
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline):
+    """
+    Format the change of each result from a baseline run as a table.
+    """
+    previous = {(result['scale'], result['case']): result['seconds']
+                for result in baseline['results']}
+    lines = ['{:>6} {:<18} {:>10} {:>10} {:>8}'.format('scale', 'case', 'before s', 'after s',
+                                                        'speedup')]
+    for result in results:
+        before = previous.get((result['scale'], result['case']))
+        if before is None:
+            continue
+        lines.append('{:>5}x {:<18} {:>10.4f} {:>10.4f} {:>7.2f}x'.format(
+            result['scale'], result['case'], before, result['seconds'],
+            before / result['seconds'] if result['seconds'] else 0.0))
+    return '\n'.join(lines)
+
+
+def main():
+    """
+    Run the benchmarks and write their results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scale', type=int, action='append',
+                        help='multiple of the real catalogue size (may be repeated, default 1)')
+    parser.add_argument('--case', choices=CASES, action='append',
+                        help='case to run (may be repeated, default all)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of timed runs of each case, the best being kept')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes extracting icons')
+    parser.add_argument('--output', metavar='FILE', default='benchmark-results.json',
+                        help='write the results to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results with an earlier run written to FILE')
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scale or [1]:
+        results.extend(run_scale(scale, args.case, args.repeat, args.jobs))
+
+    with open(args.output, 'w') as outfile:
+        json.dump({'created': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'cpus': os.cpu_count(),
+                   'results': results}, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare) as infile:
+            print(compare(results, json.load(infile)))
+
+
+if __name__ == '__main__':
+    main()
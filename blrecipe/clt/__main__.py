@@ -3,13 +3,15 @@ The main command-line tool for maintaining the Boundless Recipes database
 """
 import argparse
 import sys
-from . import load, recipe, extract
+from . import load, recipe, extract, tree, log
+from ..storage import PROFILES
 
 
 COMMANDS = [
     load,
     recipe,
     extract,
+    tree,
 ]
 
 
@@ -26,13 +28,20 @@ def main(args=None):
                         version='1.0')
     parser.add_argument('-v', '--verbose',
                         action='count', default=0,
-                        help='increase logging verbosity')
+                        help='increase logging verbosity (-v info, -vv debug)')
+    parser.add_argument('--database', metavar='URL',
+                        help='SQLAlchemy URL of the database '
+                             '(default: $BLRECIPE_DATABASE or sqlite:///blrecipe.db)')
+    parser.add_argument('--db-profile', choices=sorted(PROFILES),
+                        help='tune the database connections for a use '
+                             '(default: bulk-load when loading, otherwise $BLRECIPE_DB_PROFILE)')
 
     subparsers = parser.add_subparsers(title='commands')
     for command in COMMANDS:
         command.add_parser(subparsers)
 
     args = parser.parse_args(args)
+    log.configure(args.verbose)
     args.func(args)
     sys.exit(0)
 
@@ -0,0 +1,171 @@
+"""
+On-disk cache of the decoded texture atlas
+
+Inflating the atlas PNG and decoding its msgpack index dominate the start of
+every extraction.  The cache keeps the atlas as raw planar channels, one byte
+per pixel, that are memory-mapped on later runs, and the index as JSON.  Both
+are keyed by the size, mtime and hash of their source files: a matching size
+and mtime is trusted, otherwise the source is hashed so a file that was only
+touched still hits the cache.  A cached file that is missing or unreadable
+is a cache miss.
+"""
+import hashlib
+import json
+import mmap
+import os
+from PIL import Image
+from .msgpackfile import unpack
+
+
+# Bumped whenever the layout of the cached files changes
+CACHE_VERSION = 2
+
+META_NAME = 'atlas.json'
+PIXELS_NAME = 'atlas.raw'
+INDEX_NAME = 'atlas-index.json'
+
+
+def _file_digest(filename):
+    """
+    Hash the contents of a file.
+    """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_key(filename):
+    """
+    Describe the version of a source file the cache was built from.
+    """
+    stat = os.stat(filename)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'digest': _file_digest(filename),
+    }
+
+
+def _is_current(key, filename):
+    """
+    Check whether a source file is still the version described by key,
+    refreshing the recorded mtime when only the mtime changed.
+    """
+    stat = os.stat(filename)
+    if key['size'] != stat.st_size:
+        return False
+    if key['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    if key['digest'] != _file_digest(filename):
+        return False
+    key['mtime_ns'] = stat.st_mtime_ns
+    return True
+
+
+class AtlasCache(object):
+    """
+    Store and retrieve a decoded texture atlas and its index in a folder.
+    """
+
+    def __init__(self, cachedir):
+        self._cachedir = cachedir
+        self._pixels = None
+
+    def _path(self, name):
+        return os.path.join(self._cachedir, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_NAME)) as infile:
+                meta = json.load(infile)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        return meta
+
+    def _write_meta(self, meta):
+        filename = self._path(META_NAME)
+        with open(filename + '.tmp', 'w') as outfile:
+            json.dump(meta, outfile, indent=1)
+        os.replace(filename + '.tmp', filename)
+
+    def load(self, atlas_name, index_name):
+        """
+        Get the atlas size, its channels and its index, decoding and caching
+        the source files if the cache is missing or stale.
+        """
+        meta = self._read_meta()
+        if meta is None:
+            meta = {'version': CACHE_VERSION}
+        sources = meta.get('sources', {})
+
+        channels = None
+        if 'atlas' in sources and _is_current(sources['atlas'], atlas_name):
+            size = tuple(meta['size'])
+            channels = self._map_channels(size, meta['bands'])
+        if channels is None:
+            atlas = Image.open(atlas_name)
+            size = atlas.size
+            channels = atlas.split()
+            self._write_channels(channels)
+            meta['size'] = list(size)
+            meta['bands'] = len(channels)
+            sources['atlas'] = _source_key(atlas_name)
+
+        index = None
+        if 'index' in sources and _is_current(sources['index'], index_name):
+            index = self._read_index()
+        if index is None:
+            index = unpack(index_name)
+            os.makedirs(self._cachedir, exist_ok=True)
+            filename = self._path(INDEX_NAME)
+            with open(filename + '.tmp', 'w') as outfile:
+                json.dump(index, outfile)
+            os.replace(filename + '.tmp', filename)
+            sources['index'] = _source_key(index_name)
+
+        meta['sources'] = sources
+        self._write_meta(meta)
+        return size, channels, index
+
+    def _read_index(self):
+        """
+        Read the cached index, or None if it can't be read.
+        """
+        try:
+            with open(self._path(INDEX_NAME)) as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def _write_channels(self, channels):
+        """
+        Write the decoded channels one after the other.
+        """
+        os.makedirs(self._cachedir, exist_ok=True)
+        filename = self._path(PIXELS_NAME)
+        with open(filename + '.tmp', 'wb') as outfile:
+            for channel in channels:
+                outfile.write(channel.tobytes())
+        os.replace(filename + '.tmp', filename)
+
+    def _map_channels(self, size, bands):
+        """
+        Map the cached channels as read-only single-band images, or get None
+        if the cached file is missing or too short to hold them.
+        """
+        band_size = size[0] * size[1]
+        try:
+            with open(self._path(PIXELS_NAME), 'rb') as infile:
+                if os.fstat(infile.fileno()).st_size < band_size * bands:
+                    return None
+                self._pixels = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError:
+            return None
+        view = memoryview(self._pixels)
+        return [Image.frombuffer('L', size, view[i * band_size:(i + 1) * band_size],
+                                 'raw', 'L', 0, 1)
+                for i in range(bands)]
@@ -2,9 +2,38 @@
 Submodule to extract icons from the assts texture atlas
 """
 
+import hashlib
+import json
+import logging
 import os
-import msgpack
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from PIL import Image, ImageFilter
+from .atlascache import AtlasCache
+from .msgpackfile import unpack
+
+
+LOG = logging.getLogger(__name__)
+
+# The sharpening applied to every icon
+SHARPEN = ImageFilter.UnsharpMask(radius=8, percent=96, threshold=48)
+
+# Name of the manifest of extracted icons in the output folder
+MANIFEST_NAME = 'manifest.json'
+
+# Bumped whenever the rendering changes so existing icons are re-extracted
+MANIFEST_VERSION = 2
+
+# Folder and index of the unique images when deduplicating icons
+OBJECTS_DIR = 'objects'
+INDEX_NAME = 'index.json'
+
+# Encoder options for each output format
+SAVE_OPTIONS = {
+    'png': {},
+    'webp': {'lossless': True},
+}
 
 
 def add_parser(subparsers):
@@ -13,32 +42,228 @@ def add_parser(subparsers):
     """
     parser = subparsers.add_parser('extract',
                                    help='extract icons from the texture atlas')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes extracting icons')
+    parser.add_argument('--sharpen-atlas', action='store_true',
+                        help='sharpen each atlas channel once rather than each icon '
+                             '(icon edges may differ slightly)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='extract every icon even if unchanged since the last run')
+    parser.add_argument('-s', '--size', dest='sizes', type=int, action='append',
+                        metavar='PIXELS',
+                        help='also write icons scaled to fit PIXELS into a PIXELSpx folder '
+                             '(may be repeated)')
+    parser.add_argument('--webp', action='store_true',
+                        help='also write icons as lossless WebP')
+    parser.add_argument('--dedup', action='store_true',
+                        help='store each distinct image once under {}/ and hardlink icons '
+                             'to it, listed in {}'.format(OBJECTS_DIR, INDEX_NAME))
+    parser.add_argument('--cache', metavar='DIR',
+                        help='keep the decoded texture atlas in DIR between runs')
     parser.add_argument('assetdir',
                         help='root folder of the game assets')
     parser.set_defaults(func=_extract_icons)
 
 
-def _msgpack_transform(keys, data):
+class IconRenderer(object):  # pylint: disable=too-few-public-methods
+    """
+    Render icons from the luminance channels of the texture atlas.
+
+    The atlas compounds grey-scale icons on all 3 RGB channels, so each
+    channel is kept as a separate single-band image.
+    """
+
+    def __init__(self, channels, sharpened=False):
+        self._channels = channels
+        self._sharpened = sharpened
+
+    def render(self, entry):
+        """
+        Render a single icon as a greyscale image with its luminance as alpha.
+        """
+        return next(self.render_sizes(entry))[1]
+
+    def render_sizes(self, entry, sizes=()):
+        """
+        Render a single icon at its atlas size, then scaled to fit each of the
+        given sizes, from a single crop.
+
+        Yield (size, image) pairs, the atlas size being None.
+        """
+        uvs = entry['uvs']
+        box = (uvs[0], uvs[1], uvs[0] + uvs[2], uvs[1] + uvs[3])
+        luminance = self._channels[entry.get('channel', 0)].crop(box)
+        if not self._sharpened:
+            luminance = luminance.filter(SHARPEN)
+
+        # Add an alpha channel and make the background transparent.
+        yield None, Image.merge('LA', (luminance, luminance))
+        for size in sizes:
+            scale = size / max(luminance.size)
+            scaled = luminance.resize((max(1, round(luminance.size[0] * scale)),
+                                       max(1, round(luminance.size[1] * scale))),
+                                      Image.LANCZOS)
+            yield size, Image.merge('LA', (scaled, scaled))
+
+
+def _icon_path(entry, outdir):
     """
-    Transform the msgpack data into useful Python data.
+    Get the output category folder and file name of an icon.
     """
-    if isinstance(data, bytes):
-        return data.decode('utf-8')
-    elif isinstance(data, list):
-        return [_msgpack_transform(keys, element) for element in data]
-    elif isinstance(data, dict):
-        return {keys[int(key)].decode('utf-8'): _msgpack_transform(keys, value)
-                for key, value in data.items()}
-    return data
+    path = os.path.split(entry['name'])
+    return os.path.join(outdir, os.path.split(path[0])[1]), path[1]
 
 
-def _get_atlas_index(filename):
+def _icon_files(entry, sizes=(), formats=('png',)):
     """
-    Load the texture atlas index
+    Get the output files of an icon, relative to the output folder, as
+    (size, path) pairs for each size and format.
     """
-    with open(filename, 'rb') as index_file:
-        unpacked = msgpack.unpack(index_file)
-        return  _msgpack_transform(unpacked[1], unpacked[0])
+    path = os.path.split(entry['name'])
+    category = os.path.split(path[0])[1]
+    stem = os.path.splitext(path[1])[0]
+    for size in (None,) + tuple(sizes):
+        folder = category if size is None else os.path.join('{}px'.format(size), category)
+        for fmt in formats:
+            yield size, os.path.join(folder, '{}.{}'.format(stem, fmt))
+
+
+def _read_manifest(outdir):
+    """
+    Read the manifest of previously extracted icons, if it is current.
+    """
+    try:
+        with open(os.path.join(outdir, MANIFEST_NAME)) as infile:
+            manifest = json.load(infile)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('icons', {})
+
+
+def _write_manifest(outdir, icons):
+    """
+    Write the manifest of extracted icons.
+    """
+    os.makedirs(outdir, exist_ok=True)
+    filename = os.path.join(outdir, MANIFEST_NAME)
+    with open(filename + '.tmp', 'w') as outfile:
+        json.dump({'version': MANIFEST_VERSION, 'icons': icons}, outfile, indent=1, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+
+def _read_index(outdir):
+    """
+    Read the index of deduplicated icons, mapping icon files to images.
+    """
+    try:
+        with open(os.path.join(outdir, INDEX_NAME)) as infile:
+            return json.load(infile)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(outdir, index):
+    """
+    Write the index of deduplicated icons and remove the images it no
+    longer refers to.
+    """
+    filename = os.path.join(outdir, INDEX_NAME)
+    with open(filename + '.tmp', 'w') as outfile:
+        json.dump(index, outfile, indent=1, sort_keys=True)
+    os.replace(filename + '.tmp', filename)
+
+    used = set(index.values())
+    for folder, _, filenames in os.walk(os.path.join(outdir, OBJECTS_DIR)):
+        for name in filenames:
+            if os.path.relpath(os.path.join(folder, name), outdir) not in used:
+                os.remove(os.path.join(folder, name))
+
+
+def _temp_name(filename):
+    """
+    Get a temporary name to write a file under, unique to this process.
+    """
+    return '{}.{}.tmp'.format(filename, os.getpid())
+
+
+def _save_image(image, filename, fmt):
+    """
+    Save an image by replacing any existing file, so a hardlinked image is
+    never overwritten in place.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    image.save(_temp_name(filename), format=fmt, **SAVE_OPTIONS[fmt])
+    os.replace(_temp_name(filename), filename)
+
+
+def _link_image(source, filename):
+    """
+    Hardlink a file to an image, copying the image if it can't be linked.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    try:
+        os.link(source, _temp_name(filename))
+    except OSError:
+        shutil.copyfile(source, _temp_name(filename))
+    os.replace(_temp_name(filename), filename)
+
+
+def _write_icon(renderer, entry, outdir, sizes=(), formats=('png',), dedup=False):
+    """
+    Render a single icon and save it to a file for each size and format.
+
+    When deduplicating, each image is stored once under a name made of the
+    hash of its pixels and the icon files are linked to it; the images of
+    the icon are returned by file name.
+    """
+    LOG.info('%s', os.path.split(entry['name'])[1])
+    images = dict(renderer.render_sizes(entry, sizes))
+    digests = {}
+    objects = {}
+    for size, name in _icon_files(entry, sizes, formats):
+        filename = os.path.join(outdir, name)
+        fmt = os.path.splitext(name)[1][1:]
+        if not dedup:
+            _save_image(images[size], filename, fmt)
+            continue
+        if size not in digests:
+            digest = hashlib.sha1('{}x{}'.format(*images[size].size).encode('ascii'))
+            digest.update(images[size].tobytes())
+            digests[size] = digest.hexdigest()
+        objects[name] = os.path.join(OBJECTS_DIR, digests[size][:2],
+                                     '{}.{}'.format(digests[size], fmt))
+        source = os.path.join(outdir, objects[name])
+        if not os.path.exists(source):
+            _save_image(images[size], source, fmt)
+        _link_image(source, filename)
+    return objects
+
+
+# State of an icon extraction worker process
+_WORKER = {}
+
+
+def _init_worker(shm_name, size, channel_count, sharpened):
+    """
+    Attach a worker process to the atlas channels in shared memory.
+    """
+    from multiprocessing import shared_memory  # pylint: disable=import-outside-toplevel
+    shm = shared_memory.SharedMemory(name=shm_name)
+    band_size = size[0] * size[1]
+    channels = [Image.frombuffer('L', size, shm.buf[i * band_size:(i + 1) * band_size],
+                                 'raw', 'L', 0, 1)
+                for i in range(channel_count)]
+    _WORKER['shm'] = shm
+    _WORKER['renderer'] = IconRenderer(channels, sharpened)
+
+
+def _extract_worker(entry, outdir, sizes, formats, dedup):
+    """
+    Extract a single icon in a worker process.
+    """
+    return _write_icon(_WORKER['renderer'], entry, outdir, sizes, formats, dedup)
 
 
 class Extractor(object):  # pylint: disable=too-few-public-methods
@@ -50,59 +275,142 @@ class Extractor(object):  # pylint: disable=too-few-public-methods
         atlas_name = os.path.join(args.assetdir, 'gui', 'atlas.png')
         index_name = os.path.join(args.assetdir, 'gui', 'atlas.msgpack')
         self._args = args
-        self._atlas = Image.open(atlas_name)
-        self._atlas_index = _get_atlas_index(index_name)
+        self._sizes = tuple(sorted(set(args.sizes or ())))
+        self._formats = ('png', 'webp') if args.webp else ('png',)
+        self._channels = {}
+        if args.cache:
+            self._atlas = None
+            self._atlas_size, self._channels[False], self._atlas_index = \
+                AtlasCache(args.cache).load(atlas_name, index_name)
+        else:
+            self._atlas = Image.open(atlas_name)
+            self._atlas_size = self._atlas.size
+            self._atlas_index = unpack(index_name)
 
-    def extract(self):
+    def _atlas_channels(self, sharpened=None):
         """
-        Extract all icons fro the etxture atlas.
+        Decode the texture atlas once into its channels, sharpened if asked
+        for (by default, as set by --sharpen-atlas).
         """
-        for entry in self._atlas_index['sprites']:
-            if '/icons/' in entry['name']:
-                self._extract_icon(entry)
+        if sharpened is None:
+            sharpened = self._args.sharpen_atlas
+        if sharpened not in self._channels:
+            if sharpened:
+                channels = [channel.filter(SHARPEN) for channel in self._atlas_channels(False)]
+            else:
+                channels = self._atlas.split()
+            self._channels[sharpened] = channels
+        return self._channels[sharpened]
 
-    def _extract_icon(self, entry, outdir='icons'):
+    def extract(self, outdir='icons'):
         """
-        Extract a single icon fro the texture atlas.
+        Extract all icons fro the etxture atlas.
+
+        Icons whose source pixels and extraction parameters are unchanged
+        since the last run are skipped, and files of icons no longer in the
+        atlas, or of sizes and formats no longer asked for, are removed.
         """
-        path = os.path.split(entry['name'])
-        filename = path[1]
-        category = os.path.split(path[0])[1]
-        print(filename)
+        dedup = self._args.dedup
+        previous = {} if self._args.force else _read_manifest(outdir)
+        icons = {}
+        entries = []
+        for entry in self._atlas_index['sprites']:
+            if '/icons/' not in entry['name']:
+                continue
+            out_path, filename = _icon_path(entry, outdir)
+            key = os.path.relpath(os.path.join(out_path, filename), outdir)
+            icons[key] = self._manifest_record(entry)
+            if previous.get(key) == icons[key] and all(
+                    os.path.exists(os.path.join(outdir, name)) for name in icons[key]['files']):
+                continue
+            entries.append(entry)
 
-        uvs = entry['uvs']
-        try:
-            channel = entry['channel']
-        except KeyError:
-            channel = 0
-        try:
-            scale = entry['scale']
-        except KeyError:
-            scale = 1.0
+        current = {name for record in icons.values() for name in record['files']}
+        for name in {name for record in previous.values() for name in record['files']} - current:
+            LOG.info('removing %s', name)
+            try:
+                os.remove(os.path.join(outdir, name))
+            except FileNotFoundError:
+                pass
 
-        # Extract the icon image from the texture atlas.
-        uvs[2] += uvs[0]
-        uvs[3] += uvs[1]
-        icon_img = self._atlas.crop(tuple(uvs))
+        LOG.info('%d of %d icons changed', len(entries), len(icons))
+        jobs = min(self._args.jobs or 1, len(entries))
+        if jobs > 1:
+            written = self._extract_parallel(entries, outdir, jobs)
+        else:
+            written = [self._extract_icon(entry, outdir) for entry in entries]
 
-        # Extract the indicated Luminance channel: the atlas compounds
-        # grey-scale icons on all 3 RGB channels.
-        icon_img = icon_img.getchannel(channel)
+        index = _read_index(outdir) if dedup else {}
+        for objects in written:
+            index.update(objects)
+        if dedup:
+            _write_index(outdir, {name: index[name] for name in current if name in index})
+        elif os.path.exists(os.path.join(outdir, INDEX_NAME)):
+            os.remove(os.path.join(outdir, INDEX_NAME))
+            shutil.rmtree(os.path.join(outdir, OBJECTS_DIR), ignore_errors=True)
+        _write_manifest(outdir, icons)
 
-        # Sharpen
-        icon_img = icon_img.filter(ImageFilter.UnsharpMask(radius=8, percent=96, threshold=48))
+    def _manifest_record(self, entry):
+        """
+        Describe everything an extracted icon depends on: its parameters and
+        a hash of its source pixels.
+        """
+        uvs = entry['uvs']
+        channel = entry.get('channel', 0)
+        # Sharpening the whole atlas lets neighbouring pixels bleed in.
+        margin = 3 * SHARPEN.radius if self._args.sharpen_atlas else 0
+        box = (max(uvs[0] - margin, 0),
+               max(uvs[1] - margin, 0),
+               min(uvs[0] + uvs[2] + margin, self._atlas_size[0]),
+               min(uvs[1] + uvs[3] + margin, self._atlas_size[1]))
+        pixels = self._atlas_channels(sharpened=False)[channel].crop(box).tobytes()
+        return {
+            'uvs': list(uvs),
+            'channel': channel,
+            'scale': entry.get('scale', 1.0),
+            'sharpen_atlas': self._args.sharpen_atlas,
+            'hash': hashlib.sha1(pixels).hexdigest(),
+            'files': [name for _, name in _icon_files(entry, self._sizes, self._formats)],
+            'dedup': self._args.dedup,
+        }
 
-        # Add an alpha channel and make the background transparent.
-        icon_img = icon_img.convert('LA')
-        new_icon = []
-        for item in icon_img.getdata():
-            new_icon.append((item[0], item[0]))
-        icon_img.putdata(new_icon, scale)
+    def _extract_parallel(self, entries, outdir, jobs):
+        """
+        Extract icons in a pool of worker processes sharing the decoded atlas,
+        or serially where shared memory is not available (Python < 3.8).
+        """
+        try:
+            from multiprocessing import shared_memory  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            LOG.warning('shared memory not available, extracting icons serially')
+            return [self._extract_icon(entry, outdir) for entry in entries]
+        channels = self._atlas_channels()
+        band_size = self._atlas_size[0] * self._atlas_size[1]
+        shm = shared_memory.SharedMemory(create=True, size=band_size * len(channels))
+        try:
+            for i, channel in enumerate(channels):
+                shm.buf[i * band_size:(i + 1) * band_size] = channel.tobytes()
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     initializer=_init_worker,
+                                     initargs=(shm.name,
+                                               self._atlas_size,
+                                               len(channels),
+                                               self._args.sharpen_atlas)) as pool:
+                chunksize = max(1, len(entries) // (jobs * 4))
+                return list(pool.map(_extract_worker, entries, repeat(outdir),
+                                     repeat(self._sizes), repeat(self._formats),
+                                     repeat(self._args.dedup), chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
 
-        # save the icon to a file
-        out_path = os.path.join(outdir, category)
-        os.makedirs(out_path, exist_ok=True)
-        icon_img.save(os.path.join(out_path, filename))
+    def _extract_icon(self, entry, outdir='icons'):
+        """
+        Extract a single icon fro the texture atlas.
+        """
+        renderer = IconRenderer(self._atlas_channels(), self._args.sharpen_atlas)
+        return _write_icon(renderer, entry, outdir, self._sizes, self._formats,
+                           self._args.dedup)
 
 
 def _extract_icons(args):
@@ -111,5 +419,3 @@ def _extract_icons(args):
     """
     extractor = Extractor(args)
     extractor.extract()
-
-
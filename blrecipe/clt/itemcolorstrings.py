@@ -2,6 +2,7 @@
 Read and interpret the Boundless itemcolorstrings.dat file
 """
 
+import mmap
 from collections import namedtuple
 from struct import unpack_from
 
@@ -14,70 +15,90 @@ VAR_LEN = [VarLen(1, 3), VarLen(2, 6), VarLen(1, 3), VarLen(2, 10)]
 class StringTable(object):
     """
     A decoded string table.
+
+    Names are built from their word encodings on first access, and each word
+    is decoded from the word table at most once.
     """
 
     def __init__(self, data, offset, max_index):
         self._data = data
-        self._names = []
-
-        (encodings_offset, word_index_offset, words_offset, bit_length) = unpack_from('<IIIB', self._data, offset)
-        offset += (3 * 4 + 1)
-        encoding_indeces = [self._decode_intsize(offset, bit_length, i)
-                            for i in range(max_index)]
-
-        word_index_bit_length = unpack_from('<B', self._data, word_index_offset)[0]
-        word_index_length = int((words_offset - word_index_offset) * 8 / word_index_bit_length)
-        word_indeces = [self._decode_intsize(word_index_offset+1, word_index_bit_length, i)
-                        for i in range(word_index_length+1)]
-
-        for i in range(max_index):
-            self._names.append('')
-            encoding_offset = encodings_offset + encoding_indeces[i]
-            bit_offset = 0
-            encoding = self._decode_varlen(encoding_offset, bit_offset)
-            word_count = self._get_bits_at(encoding_offset,
-                                           bit_offset + encoding.data_offset,
-                                           encoding.data_len)
-            for wcount in range(word_count):
-                bit_offset += (encoding.data_offset + encoding.data_len)
-                encoding = self._decode_varlen(encoding_offset, bit_offset)
-                word_index = self._get_bits_at(encoding_offset,
-                                               bit_offset + encoding.data_offset,
-                                               encoding.data_len)
-                fmt = '{}s'.format(word_indeces[word_index+1] - word_indeces[word_index])
-                off = words_offset + word_indeces[word_index]
-                word = unpack_from(fmt, self._data, off)[0].decode('iso8859-1')
-                sep = (' ' if wcount > 0 else '')
-                self._names[i] = sep.join((self._names[i], word))
+        self._max_index = max_index
+        self._names = {}
+        self._words = {}
+
+        (self._encodings_offset,
+         self._word_index_offset,
+         self._words_offset,
+         self._bit_length) = unpack_from('<IIIB', self._data, offset)
+        self._encoding_index_offset = offset + (3 * 4 + 1)
+        self._word_index_bit_length = unpack_from('<B', self._data, self._word_index_offset)[0]
 
     def _decode_intsize(self, base_offset, bit_length, index):
         """
         Extracts the bit_length-bit integer stored at index index from base_offset.
         """
-        byte_offset = base_offset + int(index * bit_length / 8)
-        bit_offset = (index * bit_length) % 8
-        (word,) = unpack_from("<I", self._data, byte_offset)
-        value = int(format(word, '032b')[::-1][bit_offset:bit_offset+bit_length][::-1], 2)
-        return value
+        return self._get_bits_at(base_offset, index * bit_length, bit_length)
 
     def _get_bits_at(self, base_offset, bit_offset, bit_len):
         """
         Get the bit_len bits at bit_offset bits from base_offset as an integer.
         """
-        byte_offset = int(bit_offset / 8)
-        bit_in_byte_offset = bit_offset % 8
-        (word,) = unpack_from("<I", self._data, base_offset + byte_offset)
-        value = int(format(word, '032b')[::-1][bit_in_byte_offset:bit_in_byte_offset+bit_len][::-1], 2)
-        return value
+        (word,) = unpack_from('<I', self._data, base_offset + (bit_offset >> 3))
+        return (word >> (bit_offset & 7)) & ((1 << bit_len) - 1)
 
     def _decode_varlen(self, base_offset, bit_offset):
         return VAR_LEN[self._get_bits_at(base_offset, bit_offset, 2)]
 
+    def _word(self, word_index):
+        """
+        Get an indicated word from the word table.
+        """
+        try:
+            return self._words[word_index]
+        except KeyError:
+            pass
+        base_offset = self._word_index_offset + 1
+        start = self._decode_intsize(base_offset, self._word_index_bit_length, word_index)
+        end = self._decode_intsize(base_offset, self._word_index_bit_length, word_index + 1)
+        off = self._words_offset + start
+        word = self._data[off:off + end - start].decode('iso8859-1')
+        self._words[word_index] = word
+        return word
+
+    def _decode_name(self, index):
+        """
+        Build an indicated name from its word encoding.
+        """
+        encoding_offset = self._encodings_offset + self._decode_intsize(
+            self._encoding_index_offset, self._bit_length, index)
+        bit_offset = 0
+        encoding = self._decode_varlen(encoding_offset, bit_offset)
+        word_count = self._get_bits_at(encoding_offset,
+                                       bit_offset + encoding.data_offset,
+                                       encoding.data_len)
+        words = []
+        for _ in range(word_count):
+            bit_offset += (encoding.data_offset + encoding.data_len)
+            encoding = self._decode_varlen(encoding_offset, bit_offset)
+            word_index = self._get_bits_at(encoding_offset,
+                                           bit_offset + encoding.data_offset,
+                                           encoding.data_len)
+            words.append(self._word(word_index))
+        return ' '.join(words)
+
     def name(self, index):
         """
         Get an indicated name.
         """
-        return self._names[index]
+        try:
+            return self._names[index]
+        except KeyError:
+            pass
+        if not 0 <= index < self._max_index:
+            raise IndexError('string table index {} out of range'.format(index))
+        name = self._decode_name(index)
+        self._names[index] = name
+        return name
 
 
 class Translation(object):
@@ -121,6 +142,10 @@ class Translation(object):
 class ObjectNames(object):
     """
     A collection of localized object names
+
+    The file is memory-mapped rather than read, and a language's string tables
+    are only decoded when its translation is first asked for.  Translations
+    are cached until released or the file is closed.
     """
 
     def __init__(self, filename):
@@ -133,9 +158,10 @@ class ObjectNames(object):
         }
         self._items = []
         self._languages = {}
+        self._translations = {}
 
         with open(filename, 'rb') as datfile:
-            self._data = datfile.read()
+            self._data = mmap.mmap(datfile.fileno(), 0, access=mmap.ACCESS_READ)
 
             offset = 0
 
@@ -162,11 +188,39 @@ class ObjectNames(object):
                 offset += (name_length + 4)
                 self._languages[name.decode('iso8859-1')] = language_offset
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Release all cached translations and unmap the file
+        """
+        self._translations.clear()
+        self._data.close()
+
     def translation(self, language):
         """
         Get the translation for a named language
         """
-        return Translation(self._data, self._languages[language], self._name_counts)
+        try:
+            return self._translations[language]
+        except KeyError:
+            pass
+        translation = Translation(self._data, self._languages[language], self._name_counts)
+        self._translations[language] = translation
+        return translation
+
+    def release(self, language=None):
+        """
+        Drop the cached translation for a named language, or for all languages
+        """
+        if language is None:
+            self._translations.clear()
+        else:
+            self._translations.pop(language, None)
 
     def item_count(self):
         """
@@ -192,4 +246,26 @@ class ObjectNames(object):
         """
         return self._name_counts["metals"]
 
+    def subtitle_count(self):
+        """
+        Get the number of subtitles with translations
+        """
+        return self._name_counts["subtitles"] + 1
+
+
+def decode_language(filename, language):
+    """
+    Decode every metal, item and subtitle name of one language in a named
+    file.
+
+    Returns (metals, items, subtitles) lists indexed by metal, item and
+    subtitle index.  Being a plain function of picklable arguments, it can be
+    used as a process pool worker.
+    """
+    with ObjectNames(filename) as object_names:
+        translation = object_names.translation(language)
+        return ([translation.metal(i) for i in range(object_names.metal_count())],
+                [translation.item(i) for i in range(object_names.item_count())],
+                [translation.subtitle(i) for i in range(object_names.subtitle_count())])
+
 
@@ -1,17 +1,28 @@
 """
 Submodule to handle new file loads
 """
+import hashlib
 import json
+import logging
 import os
-import msgpack
-from sqlalchemy.exc import IntegrityError
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from ..storage import Database, Translation, Item, Quantity
 from ..storage import AttrBundle, AttrBundleGroup, AttrConstant, AttrModifier, AttrArchetype
 from ..storage import Language, Machine
 from ..storage import Recipe, RecipeQuantity, Ingredient, IngredientGroup
 from ..storage import ItemName, MetalName
 from ..storage import ResourceTag
-from .itemcolorstrings import ObjectNames
+from ..storage import SourceFile, RecordHash
+from ..storage import rebuild_item_uses
+from .itemcolorstrings import ObjectNames, decode_language
+from .msgpackfile import unpack, iter_map, iter_array
+from .telemetry import LoadTelemetry
+from .log import Lazy
+
+
+LOG = logging.getLogger(__name__)
 
 
 def add_parser(subparsers):
@@ -22,159 +33,409 @@ def add_parser(subparsers):
                                    help='load JSON files from a new release')
     parser.add_argument('-R', '--release',
                         help='game release number')
+    parser.add_argument('--asset-index', metavar='FILE',
+                        help='cache the asset tree index in FILE between runs')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write per-phase load telemetry to FILE as JSON')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='record the peak memory of each load phase')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='number of worker processes for decoding (default: CPU count)')
     parser.add_argument('assetdir',
                         help='root folder of the game assets')
     parser.set_defaults(func=load_file)
 
 
-def msgpack_transform(keys, data):
+# Database profile used unless another one is chosen
+BULK_PROFILE = 'bulk-load'
+
+# Number of recipes added to the session between commits
+RECIPE_BATCH_SIZE = 500
+
+# Number of values bound in a single SQL IN (...) clause
+SQL_CHUNK_SIZE = 500
+
+
+def scan_asset_tree(assetdir, directories=None):
+    """
+    Walk the asset tree once and map each file name to the paths it occurs at.
+
+    Paths are ordered shallowest first so the least nested match is preferred.
+    Symbolic links to directories are followed, each directory being scanned
+    once.  If directories is given, the mtime of each directory scanned is
+    recorded in it by path.
     """
-    Transform the msgpack data into useful Python data.
+    index = {}
+    visited = set()
+    pending = [assetdir]
+    while pending:
+        path = pending.pop()
+        stat = os.stat(path)
+        if (stat.st_dev, stat.st_ino) in visited:
+            continue
+        visited.add((stat.st_dev, stat.st_ino))
+        if directories is not None:
+            directories[path] = stat.st_mtime_ns
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                else:
+                    index.setdefault(entry.name, []).append(entry.path)
+    for paths in index.values():
+        paths.sort(key=lambda path: (path.count(os.sep), path))
+    return index
+
+
+def _directories_unchanged(directories):
     """
-    if isinstance(data, bytes):
-        return data.decode('utf-8')
-    elif isinstance(data, list):
-        return [msgpack_transform(keys, element) for element in data]
-    elif isinstance(data, dict):
-        return {keys[int(key)].decode('utf-8'): msgpack_transform(keys, value)
-                for key, value in data.items()}
-    return data
+    Check whether none of the directories has been modified, added to or
+    removed from since their mtimes were recorded.
+    """
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in directories.items())
+    except OSError:
+        return False
 
 
-def unpack(filename):
+def load_asset_index(assetdir, cache_file=None):
     """
-    Open and unpack a named msgpack file.
+    Get the asset tree index, reusing the one in cache_file if no directory
+    of the asset tree has been modified since it was written.
     """
-    with open(filename, 'rb') as infile:
-        unpacked = msgpack.unpack(infile)
-        return msgpack_transform(unpacked[1], unpacked[0])
+    if cache_file is None:
+        return scan_asset_tree(assetdir)
+
+    assetdir = os.path.abspath(assetdir)
+    try:
+        with open(cache_file) as infile:
+            cached = json.load(infile)
+        if cached['assetdir'] == assetdir and _directories_unchanged(cached['directories']):
+            return cached['files']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    directories = {}
+    index = scan_asset_tree(assetdir, directories)
+    with open(cache_file, 'w') as outfile:
+        json.dump({'assetdir': assetdir, 'directories': directories, 'files': index}, outfile)
+    return index
 
 
 def _handcraft_from_recipe(recipe):
     return recipe['canHandCraft'] if 'canHandCraft' in recipe else None
 
 
+def _file_digest(filename):
+    """
+    Get the content hash of a named file.
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _record_digest(record):
+    """
+    Get the content hash of a single decoded record.
+    """
+    encoded = json.dumps(record, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _chunks(values, size=SQL_CHUNK_SIZE):
+    """
+    Split values into lists small enough to bind as SQL IN (...) parameters.
+    """
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class _RecordChanges(object):
+    """
+    Track which records of a source file changed since it was last loaded.
+    """
+
+    def __init__(self, session, source):
+        self._session = session
+        self._source = source
+        self._stored = dict(session.query(RecordHash.key, RecordHash.digest)
+                            .filter_by(source=source))
+        self._pending = {}
+        self._loaded = {}
+
+    def changed(self, records):
+        """
+        Filter (key, value) pairs down to the new or changed records.
+
+        Yields (key, value, owned) where owned is whether the record was
+        previously loaded from this source.
+        """
+        for key, value in records:
+            key = str(key)
+            digest = _record_digest(value)
+            previous = self._stored.pop(key, None)
+            if previous != digest:
+                self._pending[key] = digest
+                yield key, value, previous is not None
+
+    def loaded(self, key):
+        """
+        Mark a changed record as written to the database.
+        """
+        self._loaded[key] = self._pending.pop(key)
+
+    @property
+    def removed(self):
+        """
+        The keys of previously loaded records that are no longer in the source.
+        Only complete once changed() has been exhausted.
+        """
+        return set(self._stored)
+
+    def save(self):
+        """
+        Store the hashes of the records loaded since the last save and forget
+        the removed ones, in the session's current transaction.
+        """
+        for chunk in _chunks(list(self._loaded) + list(self._stored)):
+            self._session.query(RecordHash)\
+                         .filter(RecordHash.source == self._source, RecordHash.key.in_(chunk))\
+                         .delete(synchronize_session=False)
+        self._session.bulk_insert_mappings(RecordHash,
+                                           [{'source': self._source, 'key': key, 'digest': digest}
+                                            for key, digest in self._loaded.items()])
+        self._loaded = {}
+        self._stored = {}
+
+
 class Loader(object):  # pylint: disable=too-few-public-methods
     """
     Wrap the stateful loading of game files into the database.
+
+    Every file and every record loaded is hashed, so loading a new release
+    into an existing database skips unchanged files and only writes the
+    records that were added, changed or removed.
     """
 
     def __init__(self, args):
-        if args.verbose > 0:
-            print('processing "{}"'.format(args.assetdir))
+        LOG.info('processing "%s"', args.assetdir)
         self._args = args
-        self._db = Database()
+        self._db = Database(args.database, args.db_profile or BULK_PROFILE)
         self._session = self._db.session()
+        self._asset_index = None
+        self._telemetry = LoadTelemetry(trace_memory=args.trace_memory)
+        self._telemetry.attach(self._session.connection())
 
-        self.quantities = self._session.query(Quantity)[:]
+        self.quantities = {quantity.quantity_id: quantity
+                           for quantity in self._session.query(Quantity)}
         self.machines = {machine.name: machine for machine in self._session.query(Machine)}
+        self.items = {item.id: item for item in self._session.query(Item)}
 
     def load_files(self):
         """
         Performs the actual load of various game files to the database.
+
+        Items are loaded first: the names, block data and recipes are only
+        loaded for items that exist, and changes to the items have those
+        files loaded again in the same run.
+        """
+        phases = [
+            ('items', ['compileditems.msgpack'], self._load_itemlist),
+            ('object names', ['itemcolorstrings.dat'], self._load_object_names),
+            ('translations', ['english.json', 'english.msgpack'], self._load_translations),
+            ('attributes', ['attributes.msgpack'], self._load_attributes),
+            ('resource tags', ['resourcetags.json'], self._load_resourcetags),
+            ('blocks', ['compiledblocks.msgpack'], self._load_blocks),
+            ('recipes', ['recipes.msgpack'], self._load_recipes),
+        ]
+        for phase, filenames, handler in phases:
+            LOG.info('-=*=- loading %s -=*=-', phase)
+            with self._telemetry.phase(phase):
+                self._find_and_process_files(filenames, handler)
+
+        print(self._telemetry.summary(), file=sys.stderr)
+        if self._args.report:
+            self._telemetry.write_report(self._args.report,
+                                         assetdir=self._args.assetdir,
+                                         release=self._args.release)
+
+    def _find_and_process_files(self, target_filenames, handler):
         """
-        if self._args.verbose > 0:
-            print('-=*=- loading itemcolornames -=*=-')
-        self._find_and_process_file('itemcolorstrings.dat', self._load_object_names)
-        if self._args.verbose > 0:
-            print('-=*=- loading translations -=*=-')
-        self._find_and_process_file('english.json', self._load_translation)
-        self._find_and_process_file('english.msgpack', self._load_packed_translation)
-        if self._args.verbose > 0:
-            print('-=*=- loading attributes -=*=-')
-        self._find_and_process_file('attributes.msgpack', self._load_attributes)
-        if self._args.verbose > 0:
-            print('-=*=- loading resource tags -=*=-')
-        self._find_and_process_file('resourcetags.json', self._load_resourcetags)
-        if self._args.verbose > 0:
-            print('-=*=- loading items -=*=-')
-        self._find_and_process_file('compileditems.msgpack', self._load_itemlist)
-        if self._args.verbose > 0:
-            print('-=*=- loading blocks -=*=-')
-        self._find_and_process_file('compiledblocks.msgpack', self._load_blocks)
-        if self._args.verbose > 0:
-            print('-=*=- loading recipes -=*=-')
-        self._find_and_process_file('recipes.msgpack', self._load_recipes)
-
-    def _find_and_process_file(self, target_filename, handler):
-        """
-        Find a named file and hand it off to a processor function
-        """
-        for dirname, _, files in os.walk(self._args.assetdir):
-            for filename in files:
-                if filename == target_filename:
-                    handler(os.path.join(dirname, filename))
-                    return
-        print('{} not found'.format(target_filename))
+        Find named files and hand the paths of those found off to a processor
+        function, unless they are the same files, unchanged, as when they were
+        last loaded.
+
+        A file whose records depend on another's is loaded with it, as a
+        single source.
+        """
+        if self._asset_index is None:
+            self._asset_index = load_asset_index(self._args.assetdir, self._args.asset_index)
+        found = {}
+        for target_filename in target_filenames:
+            paths = self._asset_index.get(target_filename)
+            if not paths:
+                LOG.warning('%s not found', target_filename)
+                continue
+            if len(paths) > 1:
+                LOG.warning('%s found in %d places, using "%s"',
+                            target_filename, len(paths), paths[0])
+            found[target_filename] = paths[0]
+        if not found:
+            return
+
+        digests = {name: _file_digest(path) for name, path in found.items()}
+        sources = {source.name: source
+                   for source in self._session.query(SourceFile)
+                   .filter(SourceFile.name.in_(target_filenames))}
+        if set(sources) == set(found) and all(sources[name].digest == digest
+                                              for name, digest in digests.items()):
+            for name in found:
+                LOG.info('%s unchanged since release %s', name, sources[name].release)
+            return
+
+        handler(*found.values())
+
+        for name in target_filenames:
+            source = sources.get(name)
+            if name not in found:
+                if source is not None:
+                    self._session.delete(source)
+                continue
+            if source is None:
+                source = SourceFile(name, digests[name])
+                self._session.add(source)
+            source.digest = digests[name]
+            source.release = self._args.release
+        self._session.commit()
+
+    def _delete_in(self, column, values):
+        """
+        Delete the rows whose column matches any of values.
+        """
+        for chunk in _chunks(values):
+            self._session.query(column.class_)\
+                         .filter(column.in_(chunk))\
+                         .delete(synchronize_session=False)
+
+    def _clear(self, *models):
+        """
+        Delete every row of the given models, for files that are reloaded whole.
+        """
+        for model in models:
+            self._session.query(model).delete(synchronize_session=False)
 
     def _load_object_names(self, filename):
         """
         Load the object names file... defined the actual item list, too
+
+        Each language is decoded independently, in parallel worker processes
+        when there is more than one language and more than one job.
         """
-        object_names = ObjectNames(filename)
-        for language in object_names.languages():
-            if self._args.verbose > 0:
-                print("language: {}".format(language))
-            self._session.add(Language(name=language))
-
-        english = object_names.translation('english')
-
-        for metal_id in range(object_names.metal_count()):
-            name = english.metal(metal_id)
-            if self._args.verbose > 0:
-                print('metal "{}"'.format(name))
-            self._session.add(MetalName(lang='english',
-                                        metal_id=metal_id,
-                                        name=name))
-
-        for itm in range(object_names.item_count()):
-            item = object_names.item(itm)
-            name = english.item(itm)
-            subtitle = english.subtitle(item[1])
-            if self._args.verbose > 0:
-                print('item {}: "{}" "{}"'.format(item[0], name, subtitle))
-            self._session.add(ItemName(item_id=item[0],
-                                       name=name,
-                                       lang='english',
-                                       subtitle=subtitle))
+        with self._telemetry.decoding():
+            with ObjectNames(filename) as object_names:
+                languages = list(object_names.languages())
+                items = [object_names.item(itm) for itm in range(object_names.item_count())]
+            jobs = min(self._args.jobs or os.cpu_count() or 1, len(languages))
+            if jobs > 1:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    decoded = list(pool.map(decode_language, repeat(filename), languages))
+            else:
+                decoded = [decode_language(filename, language) for language in languages]
+
+        self._clear(Language, MetalName, ItemName)
+        LOG.info('languages: %s', ', '.join(languages))
+        self._session.bulk_insert_mappings(Language, [{'name': language}
+                                                      for language in languages])
+
+        for language, (metals, names, subtitles) in zip(languages, decoded):
+            rows = []
+            for metal_id, name in enumerate(metals):
+                LOG.debug('metal "%s"', name)
+                rows.append({'lang': language, 'metal_id': metal_id, 'name': name})
+            self._session.bulk_insert_mappings(MetalName, rows)
+
+            rows = []
+            for (item_id, subtitle_id), name in zip(items, names):
+                if item_id not in self.items:
+                    continue
+                LOG.debug('item %s: "%s" "%s"', item_id, name, subtitles[subtitle_id])
+                rows.append({'lang': language,
+                             'item_id': item_id,
+                             'name': name,
+                             'subtitle': subtitles[subtitle_id]})
+            self._session.bulk_insert_mappings(ItemName, rows)
 
         self._session.commit()
 
+    def _load_translations(self, *filenames):
+        """
+        Load the translations files of a language into the translations table
 
-    def _load_translation(self, filename):
+        The files are read together: a key in more than one of them takes the
+        value of the first, and a key is only removed once it is in none.
         """
-        Load the translations file into the translations table
+        translations = {}
+        for filename in filenames:
+            with self._telemetry.decoding():
+                if filename.endswith('.json'):
+                    with open(filename) as tfile:
+                        decoded = json.loads(tfile.read())
+                else:
+                    decoded = unpack(filename)
+            for key, value in decoded.items():
+                if key in translations:
+                    LOG.debug('.. duplicate translation key: %s', key)
+                    continue
+                translations[key] = value
+        # Translations used to be tracked per file
+        self._session.query(RecordHash)\
+                     .filter(RecordHash.source.in_([os.path.basename(filename)
+                                                    for filename in filenames]))\
+                     .delete(synchronize_session=False)
+        self._add_translations('translations#english', translations)
+
+    def _add_translations(self, source, translations, lang='english'):
         """
-        with open(filename) as tfile:
-            translations = json.loads(tfile.read())
-            for key, value in translations.items():
-                if isinstance(value, str):
-                    self._session.add(Translation(string_id=key, value=value, lang='english'))
-            self._session.commit()
+        Bring the string translations of a language up to date in a single
+        transaction.
 
-    def _load_packed_translation(self, filename):
-        """
-        Load the translations file into the translations table
+        New keys are bulk-inserted, changed ones updated and removed ones
+        deleted.
         """
-        translations = unpack(filename)
-        for key, value in translations.items():
-            if isinstance(value, str):
-                self._session.add(Translation(string_id=key, value=value, lang='english'))
-                try:
-                    self._session.commit()
-                except IntegrityError:
-                    self._session.rollback()
-                    if self._args.verbose > 0:
-                        print('.. duplicate translation key: {}'.format(key))
+        changes = _RecordChanges(self._session, source)
+        existing = dict(self._session.query(Translation.string_id, Translation.id)
+                        .filter_by(lang=lang))
+        inserts = []
+        updates = []
+        for key, value, _ in changes.changed((key, value)
+                                             for key, value in translations.items()
+                                             if isinstance(value, str)):
+            if key not in existing:
+                inserts.append({'string_id': key, 'value': value, 'lang': lang})
+            else:
+                updates.append({'id': existing[key], 'value': value})
+            changes.loaded(key)
+        self._session.bulk_insert_mappings(Translation, inserts)
+        self._session.bulk_update_mappings(Translation, updates)
+        self._delete_in(Translation.id, [existing[key] for key in changes.removed
+                                         if key in existing])
+        changes.save()
+        self._session.commit()
 
     def _load_attributes(self, filename):
         """
         Translate and load the attributes msgpack
         """
-        attributes = unpack(filename)
+        with self._telemetry.decoding():
+            attributes = unpack(filename)
+        self._clear(AttrBundleGroup, AttrBundle, AttrArchetype, AttrModifier, AttrConstant)
         self._load_attr_constant(attributes['constants'])
-        self._load_attr_modifier(attributes['modifiers'])
-        self._load_attr_bundle(attributes['bundles'])
+        modifier_ids = self._load_attr_modifier(attributes['modifiers'])
+        self._load_attr_bundle(attributes['bundles'], modifier_ids)
         self._load_attr_archetype(attributes['archetypes'])
 
     def _load_attr_constant(self, constants):
@@ -182,44 +443,57 @@ class Loader(object):  # pylint: disable=too-few-public-methods
         Load the attribute msgpack constants section
         """
         for name, value in constants.items():
-            if self._args.verbose:
-                print('processing constant "{}"'.format(name))
+            LOG.debug('processing constant "%s"', name)
             self._session.add(AttrConstant(name=name, value=value))
         self._session.commit()
 
     def _load_attr_modifier(self, modifiers):
         """
         Load the attribute msgpack modifiers section
+
+        Returns a map of modifier name to modifier id.
         """
+        added = []
         for name, value in modifiers.items():
-            if self._args.verbose:
-                print('processing modifier "{}"'.format(name))
-            self._session.add(AttrModifier(name=name, **value))
+            LOG.debug('processing modifier "%s"', name)
+            added.append(AttrModifier(name=name, **value))
+        self._session.add_all(added)
+        self._session.flush()
+        modifier_ids = {modifier.name: modifier.id for modifier in added}
         self._session.commit()
+        return modifier_ids
 
-    def _load_attr_bundle(self, bundles):
+    def _load_attr_bundle(self, bundles, modifier_ids):
         """
         Load the attribute msgpack bundles section
+
+        Bundles are resolved to ids by name from the insert pass, so the
+        bundle groups can be written in one bulk statement.
         """
+        added = []
         for name, attrs in bundles.items():
-            if self._args.verbose:
-                print('processing bundle "{}"'.format(name))
-            self._session.add(AttrBundle(name=name, **attrs))
+            LOG.debug('processing bundle "%s"', name)
+            bundle = AttrBundle(name=name, **attrs)
+            for mod in attrs.get('modifiers', []):
+                LOG.debug('processing modifier "%s" for %s', mod, name)
+                if mod not in modifier_ids:
+                    LOG.warning('bundle "%s" has unknown modifier "%s"', name, mod)
+                    continue
+                bundle.modifier_id = modifier_ids[mod]
+            added.append(bundle)
+        self._session.add_all(added)
+        self._session.flush()
+        bundle_ids = {bundle.name: bundle.id for bundle in added}
+
+        groups = []
         for name, attrs in bundles.items():
-            bundle = self._session.query(AttrBundle).filter_by(name=name).first()
-            if 'bundles' in attrs:
-                for sub in attrs['bundles']:
-                    if self._args.verbose:
-                        print('processing bundle group "{}" for {}'.format(sub, bundle.name))
-                    subbundle = self._session.query(AttrBundle).filter_by(name=sub).first()
-                    bundle.bundleGroup.append(AttrBundleGroup(bundle_id=bundle.id,
-                                                              subbundle_id=subbundle.id))
-            if 'modifiers' in attrs:
-                for mod in attrs['modifiers']:
-                    if self._args.verbose:
-                        print('processing modifier "{}" for {}'.format(mod, bundle.name))
-                    modifier = self._session.query(AttrModifier).filter_by(name=mod).first()
-                    bundle.modifier = modifier
+            for sub in attrs.get('bundles', []):
+                LOG.debug('processing bundle group "%s" for %s', sub, name)
+                if sub not in bundle_ids:
+                    LOG.warning('bundle "%s" has unknown sub-bundle "%s"', name, sub)
+                    continue
+                groups.append({'bundle_id': bundle_ids[name], 'subbundle_id': bundle_ids[sub]})
+        self._session.bulk_insert_mappings(AttrBundleGroup, groups)
         self._session.commit()
 
     def _load_attr_archetype(self, archetypes):
@@ -227,8 +501,7 @@ class Loader(object):  # pylint: disable=too-few-public-methods
         Load the attribute msgpack archetypes section
         """
         for target, arches in archetypes.items():
-            if self._args.verbose:
-                print('processing archetype "{}"'.format(target))
+            LOG.debug('processing archetype "%s"', target)
             for name, attrs in arches['attributes'].items():
                 self._session.add(AttrArchetype(target=target, name=name, **attrs))
         self._session.commit()
@@ -237,131 +510,272 @@ class Loader(object):  # pylint: disable=too-few-public-methods
         """
         Load the resource tags file into the resourcetag table
         """
-        with open(filename) as tfile:
+        with self._telemetry.decoding(), open(filename) as tfile:
             rtags = json.loads(tfile.read())
-            for key, value in rtags.items():
-                self._session.add(ResourceTag(string_id=key,
-                                              found_altitude=value['foundAltitude'],
-                                              found_depth=value['foundDepth'],
-                                              found_material=value['foundMaterial'])
-                                 )
+        changes = _RecordChanges(self._session, os.path.basename(filename))
+        changed = list(changes.changed(rtags.items()))
+        self._delete_in(ResourceTag.string_id,
+                        [key for key, _, _ in changed] + list(changes.removed))
+        for key, value, _ in changed:
+            self._session.add(ResourceTag(string_id=key,
+                                          found_altitude=value['foundAltitude'],
+                                          found_depth=value['foundDepth'],
+                                          found_material=value['foundMaterial'])
+                             )
+            changes.loaded(key)
+        changes.save()
         self._session.commit()
 
     def _load_itemlist(self, filename):
         """
         Load the compiled items JSON
+
+        Block data and recipes are applied to the items that exist when they
+        are loaded, so they are loaded again for items added, changed or
+        removed even if their files are unchanged.
         """
-        itemlist = unpack(filename)
-        for key, item in itemlist.items():
-            if self._args.verbose:
-                print('adding item"{}"'.format(item['name']))
-            itemrec = Item(id=item["id"],
-                           string_id=item['stringID'],
-                           coin_value=item['coinValue'],
-                           list_type_id=item['listTypeName'])
-            self._session.add(itemrec)
+        changes = _RecordChanges(self._session, os.path.basename(filename))
+        changed = []
+        added = []
+        for key, item, _ in changes.changed((item['id'], item)
+                                            for _, item
+                                            in self._telemetry.timed(iter_map(filename))):
+            LOG.debug('adding item "%s"', item['name'])
+            itemrec = self.items.get(item['id'])
+            if itemrec is None:
+                itemrec = Item(id=item['id'])
+                self._session.add(itemrec)
+                self.items[itemrec.id] = itemrec
+                added.append(itemrec.id)
+            itemrec.string_id = item['stringID']
+            itemrec.coin_value = item['coinValue']
+            itemrec.list_type_id = item['listTypeName']
+            changed.append(itemrec.id)
+            changes.loaded(key)
+        removed = [int(key) for key in changes.removed]
+        self._delete_items(removed)
+        if changed or removed:
+            self._forget('compiledblocks.msgpack', 'compiledblocks.msgpack', changed + removed)
+        if added:
+            # Any name, recipe or group may refer to the new items
+            self._forget('itemcolorstrings.dat')
+            self._forget('recipes.msgpack', 'recipes.msgpack#groups')
+            self._forget('recipes.msgpack', 'recipes.msgpack#recipes')
+        elif removed:
+            self._forget('recipes.msgpack', 'recipes.msgpack#recipes', removed)
+        changes.save()
         self._session.commit()
 
+    def _delete_items(self, item_ids):
+        """
+        Delete items with their names, their recipes, and the ingredients and
+        group memberships referring to them.
+
+        The recipes and groups that referred to them are loaded again on the
+        next load of their file.
+        """
+        if not item_ids:
+            return
+        recipes = []
+        users = set()
+        groups = set()
+        for chunk in _chunks(item_ids):
+            recipes.extend(recipe_id for (recipe_id,)
+                           in self._session.query(Recipe.id).filter(Recipe.item_id.in_(chunk)))
+            users.update(output for (output,)
+                         in self._session.query(Recipe.item_id)
+                         .join(Ingredient, Ingredient.recipe_id == Recipe.id)
+                         .filter(Ingredient.item_id.in_(chunk)))
+            groups.update(name for (name,)
+                          in self._session.query(IngredientGroup.name)
+                          .filter(IngredientGroup.item_id.in_(chunk)))
+        self._delete_in(Ingredient.recipe_id, recipes)
+        self._delete_in(RecipeQuantity.recipe_id, recipes)
+        self._delete_in(Recipe.id, recipes)
+        self._delete_in(Ingredient.item_id, item_ids)
+        self._delete_in(IngredientGroup.item_id, item_ids)
+        self._delete_in(ItemName.item_id, item_ids)
+        self._delete_in(Item.id, item_ids)
+        for item_id in item_ids:
+            self.items.pop(item_id, None)
+
+        self._forget('recipes.msgpack', 'recipes.msgpack#recipes', users)
+        self._forget('recipes.msgpack', 'recipes.msgpack#groups', groups)
+
+    def _forget(self, filename, source=None, keys=None):
+        """
+        Have a file processed on its next load even if it is unchanged, and
+        the records of a source with the given keys, or all of them, loaded
+        from it again.
+        """
+        self._session.query(SourceFile).filter_by(name=filename)\
+                                       .delete(synchronize_session=False)
+        if source is None:
+            return
+        if keys is None:
+            self._session.query(RecordHash).filter_by(source=source)\
+                                           .delete(synchronize_session=False)
+            return
+        for chunk in _chunks(str(key) for key in keys):
+            self._session.query(RecordHash)\
+                         .filter(RecordHash.source == source, RecordHash.key.in_(chunk))\
+                         .delete(synchronize_session=False)
+
     def _load_blocks(self, filename):
         """
         Load the blocks JSON
         """
-        contents = unpack(filename)
-        blocks = contents['BlockTypesData']
-        for block in blocks:
-            if block is None:
-                continue
+        changes = _RecordChanges(self._session, os.path.basename(filename))
+        for key, block, _ in changes.changed((block['id'], block)
+                                             for block
+                                             in self._telemetry.timed(iter_array(filename,
+                                                                                 'BlockTypesData'))
+                                             if block is not None):
             block_id = block['id']
-            items = self._session.query(Item).filter_by(id=block_id).all()
-            if len(items) == 0:
-                print('no item matches block id "{}"'.format(block_id))
-            try:
-                item = items[0]
-                if self._args.verbose:
-                    print('processing block "{}"'.format(item.name()))
-                item.prestige = block['prestige']
-                item.build_xp = block['buildXP']
-                item.mine_xp = block['mineXP']
-            except IndexError:
-                if self._args.verbose:
-                    print('no item for block id={}'.format(block_id))
-
+            item = self.items.get(block_id)
+            if item is None:
+                LOG.warning('no item matches block id "%s"', block_id)
+                continue
+            LOG.debug('processing block "%s"', Lazy(item.name))
+            item.prestige = block['prestige']
+            item.build_xp = block['buildXP']
+            item.mine_xp = block['mineXP']
+            changes.loaded(key)
+        for key in changes.removed:
+            item = self.items.get(int(key))
+            if item is not None:
+                item.prestige = 0
+                item.build_xp = 0
+                item.mine_xp = 0
+
+        changes.save()
         self._session.commit()
 
     def _load_recipes(self, filename):
         """
         Load the recipes JSON
+
+        Recipes are tracked per output item: when any recipe for an item
+        changes, all of that item's recipes are replaced.  The rows of an
+        item are replaced even if it has no stored hash, as in a database
+        written before hashes were kept, and the hashes are committed with
+        each batch of recipes so an interrupted load resumes where it stopped.
         """
-        recipe_data = unpack(filename)
-        for group in recipe_data['groups']:
-            if self._args.verbose:
-                print('adding recipe ingredient group "{}"'.format(group['groupName']))
+        source = os.path.basename(filename)
+        changes = _RecordChanges(self._session, source + '#groups')
+        groups = list(changes.changed((group['groupName'], group)
+                                      for group
+                                      in self._telemetry.timed(iter_array(filename, 'groups'))))
+        self._delete_in(IngredientGroup.name,
+                        [key for key, _, _ in groups] + list(changes.removed))
+        for key, group, _ in groups:
+            LOG.debug('adding recipe ingredient group "%s"', group['groupName'])
             for item_id in group['groupMembers']:
+                if item_id not in self.items:
+                    LOG.warning('item "%s" not found for group "%s"', item_id, group['groupName'])
+                    continue
                 self._session.add(IngredientGroup(name=group['groupName'], item_id=item_id))
+            changes.loaded(key)
+        changes.save()
         self._session.commit()
 
-        for recipe in recipe_data['recipes']:
-            output_item_id = recipe['outputItem']
-            output_item = self._session.query(Item).filter_by(id=output_item_id).first()
+        recipes_by_output = {}
+        for recipe in self._telemetry.timed(iter_array(filename, 'recipes')):
+            recipes_by_output.setdefault(recipe['outputItem'], []).append(recipe)
+
+        changes = _RecordChanges(self._session, source + '#recipes')
+        changed = list(changes.changed(recipes_by_output.items()))
+        stale_outputs = [int(key) for key, _, _ in changed]
+        stale_outputs.extend(int(key) for key in changes.removed)
+        stale_recipes = []
+        for chunk in _chunks(stale_outputs):
+            stale_recipes.extend(recipe_id for (recipe_id,)
+                                 in self._session.query(Recipe.id)
+                                 .filter(Recipe.item_id.in_(chunk)))
+        self._delete_in(Ingredient.recipe_id, stale_recipes)
+        self._delete_in(RecipeQuantity.recipe_id, stale_recipes)
+        self._delete_in(Recipe.id, stale_recipes)
+
+        count = 0
+        for key, recipes, _ in changed:
+            output_item = self.items.get(int(key))
             if output_item is None:
-                print('item "{}" not found'.format(output_item_id))
+                LOG.warning('item "%s" not found', key)
                 continue
-
-            new_recipe = Recipe(experience=recipe['craftXP'] if 'craftXP' in recipe else None,
-                                heat=recipe['heat'] if 'heat' in recipe else None,
-                                power=recipe['power'] if 'power' in recipe else None,
-                                handcraftable=_handcraft_from_recipe(recipe))
-            if 'machine' in recipe:
-                new_recipe.machine = self.machines[recipe['machine']]
-            output_item.recipes.append(new_recipe)
-
-            for i, amount in enumerate(recipe['outputQuantity']):
-                rquant = RecipeQuantity(new_recipe, self.quantities[i])
-                rquant.spark = recipe['spark'][i]
-                rquant.wear = recipe['wear'][i]
-                rquant.duration = recipe['duration'][i]
-                rquant.produces = amount
-
-            inputs = recipe['inputs']
-            if inputs:
-                for recipe_input in inputs:
-                    if 'groupId' in recipe_input:
-                        print('  "{}"'.format(recipe_input['groupId']))
-                        for i, amount in enumerate(recipe_input['inputQuantity']):
-                            ringr = Ingredient()
-                            ringr.recipe = new_recipe
-                            ringr.group_name = recipe_input['groupId']
-                            ringr.quantity = self.quantities[i]
-                            ringr.amount = amount
-                    else:
-                        input_item = self._session.query(Item)\
-                                         .filter_by(id=recipe_input['inputItems'][0])\
-                                         .first()
-                        print('  "{}"'.format(input_item))
-                        for i, amount in enumerate(recipe_input['inputQuantity']):
-                            ringr = Ingredient()
-                            ringr.recipe = new_recipe
-                            ringr.item = input_item
-                            ringr.quantity = self.quantities[i]
-                            ringr.amount = amount
-
-            try:
-                new_recipe.power = recipe['powerRequired']
-            except KeyError:
-                if self._args.verbose:
-                    print('  item {} missing power'.format(output_item.name()))
-
-            try:
-                prereqs = recipe['prerequisites']
-                for req in prereqs:
-                    new_recipe.attribute = req['attribute'].rpartition(' Level')[0]
-                    new_recipe.attribute_level = req['level']
-            except KeyError:
-                if self._args.verbose:
-                    print('  item {} missing prereqs'.format(output_item.name()))
-
-            self._session.commit()
-            print('{}'.format(new_recipe))
+            for recipe in recipes:
+                new_recipe = self._add_recipe(recipe, output_item)
+                LOG.debug('%s', new_recipe)
+            changes.loaded(key)
+            count += len(recipes)
+            if count >= RECIPE_BATCH_SIZE:
+                changes.save()
+                self._session.commit()
+                count = 0
+        changes.save()
+
+        # Committed with the file's load state, so an interrupted load indexes
+        # the uses when it loads the file again
+        LOG.info('indexing item uses')
+        rebuild_item_uses(self._session)
+
+    def _add_recipe(self, recipe, output_item):
+        """
+        Add a single recipe for an item
+        """
+        new_recipe = Recipe(experience=recipe['craftXP'] if 'craftXP' in recipe else None,
+                            heat=recipe['heat'] if 'heat' in recipe else None,
+                            power=recipe['power'] if 'power' in recipe else None,
+                            handcraftable=_handcraft_from_recipe(recipe))
+        if 'machine' in recipe:
+            new_recipe.machine = self.machines[recipe['machine']]
+        new_recipe.item = output_item
+        self._session.add(new_recipe)
+
+        for i, amount in enumerate(recipe['outputQuantity']):
+            rquant = RecipeQuantity(new_recipe, self.quantities[i])
+            rquant.spark = recipe['spark'][i]
+            rquant.wear = recipe['wear'][i]
+            rquant.duration = recipe['duration'][i]
+            rquant.produces = amount
+
+        inputs = recipe['inputs']
+        if inputs:
+            for recipe_input in inputs:
+                if 'groupId' in recipe_input:
+                    LOG.debug('  "%s"', recipe_input['groupId'])
+                    for i, amount in enumerate(recipe_input['inputQuantity']):
+                        ringr = Ingredient()
+                        ringr.recipe = new_recipe
+                        ringr.group_name = recipe_input['groupId']
+                        ringr.quantity = self.quantities[i]
+                        ringr.amount = amount
+                else:
+                    input_item = self.items.get(recipe_input['inputItems'][0])
+                    if input_item is None:
+                        LOG.warning('item "%s" not found for %s',
+                                    recipe_input['inputItems'][0], Lazy(output_item.name))
+                        continue
+                    LOG.debug('  "%s"', input_item)
+                    for i, amount in enumerate(recipe_input['inputQuantity']):
+                        ringr = Ingredient()
+                        ringr.recipe = new_recipe
+                        ringr.item = input_item
+                        ringr.quantity = self.quantities[i]
+                        ringr.amount = amount
+
+        try:
+            new_recipe.power = recipe['powerRequired']
+        except KeyError:
+            LOG.debug('  item %s missing power', Lazy(output_item.name))
+
+        try:
+            prereqs = recipe['prerequisites']
+            for req in prereqs:
+                new_recipe.attribute = req['attribute'].rpartition(' Level')[0]
+                new_recipe.attribute_level = req['level']
+        except KeyError:
+            LOG.debug('  item %s missing prereqs', Lazy(output_item.name))
+        return new_recipe
 
 
 def load_file(args):
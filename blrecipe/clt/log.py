@@ -0,0 +1,37 @@
+"""
+Logging for the command-line tools
+
+Diagnostics go through the standard logging module so that their messages are
+only formatted when their level is enabled.  Pass anything expensive to
+compute, and in particular anything that would query the database, wrapped in
+Lazy so it is only evaluated if the message is actually emitted.
+"""
+import logging
+
+
+def configure(verbosity):
+    """
+    Set the logging level from the number of -v options given.
+    """
+    if verbosity <= 0:
+        level = logging.WARNING
+    elif verbosity == 1:
+        level = logging.INFO
+    else:
+        level = logging.DEBUG
+    logging.basicConfig(format='%(message)s', level=level)
+
+
+class Lazy(object):  # pylint: disable=too-few-public-methods
+    """
+    A log message argument evaluated only when the message is formatted.
+    """
+
+    __slots__ = ('_func', '_args')
+
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        return str(self._func(*self._args))
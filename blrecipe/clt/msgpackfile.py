@@ -0,0 +1,97 @@
+"""
+Decode the key-table msgpack files shipped with the game assets
+
+The game's msgpack files hold a two-element array: the data, in which every
+map key is an index, followed by the table of key names those indexes refer
+to.  The key table is decoded once into interned strings and map keys are
+translated as each map is built by the msgpack extension itself, so there is
+no recursive Python pass over the data.
+"""
+import os
+import sys
+import msgpack
+
+
+def _unpacker(infile, **kwargs):
+    """
+    Create a streaming unpacker sized for the whole of an open file.
+    """
+    size = max(os.fstat(infile.fileno()).st_size, 1)
+    return msgpack.Unpacker(infile,
+                            raw=False,
+                            strict_map_key=False,
+                            max_buffer_size=size,
+                            **kwargs)
+
+
+def _read_keys(infile):
+    """
+    Decode the key table that follows the data in an open msgpack file.
+    """
+    unpacker = _unpacker(infile)
+    unpacker.read_array_header()
+    unpacker.skip()
+    return [sys.intern(key.decode('utf-8') if isinstance(key, bytes) else key)
+            for key in unpacker.unpack()]
+
+
+def _data_unpacker(infile):
+    """
+    Get an unpacker positioned at the data of an open msgpack file with its map
+    keys translated through the file's key table.
+    """
+    keys = _read_keys(infile)
+    infile.seek(0)
+    unpacker = _unpacker(infile,
+                         object_pairs_hook=lambda pairs: {keys[int(key)]: value
+                                                          for key, value in pairs})
+    unpacker.read_array_header()
+    return unpacker, keys
+
+
+def _seek_path(unpacker, keys, path):
+    """
+    Advance the unpacker through nested maps to the value at path, skipping
+    everything else.
+    """
+    for name in path:
+        for _ in range(unpacker.read_map_header()):
+            if keys[int(unpacker.unpack())] == name:
+                break
+            unpacker.skip()
+        else:
+            raise KeyError(name)
+
+
+def unpack(filename):
+    """
+    Open and unpack a named msgpack file.
+    """
+    with open(filename, 'rb') as infile:
+        unpacker, _ = _data_unpacker(infile)
+        return unpacker.unpack()
+
+
+def iter_map(filename, *path):
+    """
+    Lazily yield the (key, value) pairs of the map found at path in a named
+    msgpack file.
+    """
+    with open(filename, 'rb') as infile:
+        unpacker, keys = _data_unpacker(infile)
+        _seek_path(unpacker, keys, path)
+        for _ in range(unpacker.read_map_header()):
+            key = keys[int(unpacker.unpack())]
+            yield key, unpacker.unpack()
+
+
+def iter_array(filename, *path):
+    """
+    Lazily yield the elements of the array found at path in a named msgpack
+    file.
+    """
+    with open(filename, 'rb') as infile:
+        unpacker, keys = _data_unpacker(infile)
+        _seek_path(unpacker, keys, path)
+        for _ in range(unpacker.read_array_header()):
+            yield unpacker.unpack()
@@ -1,12 +1,16 @@
 """
 Submodule to handle printing a recipe
 """
+import logging
 import re
 import string
 from sys import exit
 from ..storage import Database, Item, ItemName, ResourceTag
 
 
+LOG = logging.getLogger(__name__)
+
+
 def add_parser(subparser):
     """
     Add the CLI argument parser for this submodule
@@ -249,40 +253,47 @@ def print_recipe(args):
     """
     Print the recipe
     """
-    if args.verbose > 0:
-        print('recipe for "{}"'.format(args.item_name))
+    LOG.info('recipe for "%s"', args.item_name)
 
-    database = Database()
+    database = Database(args.database, args.db_profile)
     session = database.session()
 
     target_item = session.query(ItemName).filter_by(lang="english", name=args.item_name).first()
     if target_item is None:
-        print('no item matches "{}"'.format(args.item_name))
+        LOG.error('no item matches "%s"', args.item_name)
         exit(1)
 
-    if args.verbose > 0:
-        print('==> item {} ({})'.format(target_item.item_id, target_item.name))
+    LOG.info('==> item %s (%s)', target_item.item_id, target_item.name)
 
-    recipe_boxes = []
     items = session.query(Item).filter_by(id=target_item.item_id)
     if items.count() > 0:
         item = min(items, key=lambda i: len(i.name()))
         tags = session.query(ResourceTag).filter_by(string_id=item.string_id).first()
-        item_info = get_item_info(item, tags)
-        final_recipe = None
-        for recipe in item.recipes:
-            if recipe.machine and recipe.machine.name == 'FURNACE':
-                recipe_boxes.append(format_furnace_recipe_wiki(recipe))
-            else:
-                recipe_boxes.append(format_recipe_wiki(recipe))
-            item_info['craft_xp'] = recipe.experience
-            final_recipe = recipe
-
-        if args.print_infobox:
-            print('<noinclude>{{Version|249}}</noinclude>')
-            print(_format_infobox_wiki(item_info), end='')
-        for recipe in recipe_boxes:
-            print(recipe)
-        if args.print_infobox:
-            print(_format_uses_wiki(item_info), end='')
-            print_categories_wiki(item_info, final_recipe)
+        print_item_wiki(item, tags, args.print_infobox)
+
+
+def print_item_wiki(item, tags, print_infobox=False):
+    """
+    Print the recipes of an item, and optionally its infobox, as wiki text.
+
+    The item and its tags may be storage models or catalogue snapshot records.
+    """
+    recipe_boxes = []
+    item_info = get_item_info(item, tags)
+    final_recipe = None
+    for recipe in item.recipes:
+        if recipe.machine and recipe.machine.name == 'FURNACE':
+            recipe_boxes.append(format_furnace_recipe_wiki(recipe))
+        else:
+            recipe_boxes.append(format_recipe_wiki(recipe))
+        item_info['craft_xp'] = recipe.experience
+        final_recipe = recipe
+
+    if print_infobox:
+        print('<noinclude>{{Version|249}}</noinclude>')
+        print(_format_infobox_wiki(item_info), end='')
+    for recipe in recipe_boxes:
+        print(recipe)
+    if print_infobox:
+        print(_format_uses_wiki(item_info), end='')
+        print_categories_wiki(item_info, final_recipe)
@@ -0,0 +1,159 @@
+"""
+Per-phase telemetry for loading game files
+
+Each load phase records its wall time, the time spent decoding game files,
+the time spent executing SQL statements, the number of rows written and,
+optionally, the tracemalloc peak of the allocations made during the phase.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class PhaseStats(object):  # pylint: disable=too-few-public-methods
+    """
+    The measurements for a single load phase.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.wall_time = 0.0
+        self.decode_time = 0.0
+        self.db_time = 0.0
+        self.rows = 0
+        self.peak_memory = None
+
+    @property
+    def rows_per_second(self):
+        """
+        Get the write throughput of the phase.
+        """
+        return self.rows / self.wall_time if self.wall_time > 0 else 0.0
+
+    def as_dict(self):
+        """
+        Get the measurements as JSON-serializable data.
+        """
+        return {
+            'phase': self.name,
+            'wall_time': self.wall_time,
+            'decode_time': self.decode_time,
+            'db_time': self.db_time,
+            'rows': self.rows,
+            'rows_per_second': self.rows_per_second,
+            'peak_memory': self.peak_memory,
+        }
+
+
+class LoadTelemetry(object):
+    """
+    Collect PhaseStats for a sequence of load phases.
+
+    DB time is the time spent executing statements on the attached connection,
+    as seen by SQLAlchemy's cursor execution events; decode time is whatever
+    the loader wraps in decoding() or timed().
+    """
+
+    def __init__(self, trace_memory=False):
+        self.phases = []
+        self._trace_memory = trace_memory
+        self._current = None
+        self._statement_start = 0.0
+
+    def attach(self, connection):
+        """
+        Start timing and counting the statements executed on a connection.
+        """
+        event.listen(connection, 'before_cursor_execute', self._before_execute)
+        event.listen(connection, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, *args):  # pylint: disable=unused-argument
+        self._statement_start = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, *args):  # pylint: disable=unused-argument
+        if self._current is None:
+            return
+        self._current.db_time += time.perf_counter() - self._statement_start
+        if not statement.lstrip().upper().startswith('SELECT') and cursor.rowcount > 0:
+            self._current.rows += cursor.rowcount
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure a named load phase.
+        """
+        stats = PhaseStats(name)
+        self.phases.append(stats)
+        self._current = stats
+        # Tracing started by the caller is left running
+        started = self._trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif self._trace_memory and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.wall_time = time.perf_counter() - start
+            if self._trace_memory:
+                stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+            self._current = None
+
+    @contextmanager
+    def decoding(self):
+        """
+        Count the enclosed block as decode time for the current phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._current is not None:
+                self._current.decode_time += time.perf_counter() - start
+
+    def timed(self, iterable):
+        """
+        Count the time taken to produce each element of a lazily decoded
+        iterable as decode time for the current phase.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.decoding():
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    return
+            yield value
+
+    def summary(self):
+        """
+        Format the collected measurements as a table.
+        """
+        lines = ['{:<14} {:>8} {:>8} {:>8} {:>9} {:>10} {:>10}'.format(
+            'phase', 'wall s', 'decode s', 'db s', 'rows', 'rows/s', 'peak KiB')]
+        for stats in self.phases:
+            peak = ('{:.0f}'.format(stats.peak_memory / 1024)
+                    if stats.peak_memory is not None else '-')
+            lines.append('{:<14} {:>8.3f} {:>8.3f} {:>8.3f} {:>9d} {:>10.0f} {:>10}'.format(
+                stats.name,
+                stats.wall_time,
+                stats.decode_time,
+                stats.db_time,
+                stats.rows,
+                stats.rows_per_second,
+                peak))
+        return '\n'.join(lines)
+
+    def write_report(self, filename, **extra):
+        """
+        Write the collected measurements to a JSON file.
+        """
+        report = dict(extra)
+        report['phases'] = [stats.as_dict() for stats in self.phases]
+        with open(filename, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
@@ -0,0 +1,92 @@
+"""
+Submodule to handle printing the crafting tree of an item
+"""
+import logging
+from sys import exit
+from ..storage import CatalogSnapshot, CraftingTrees, Database, QUANTITY_TIERS
+
+
+LOG = logging.getLogger(__name__)
+
+INDENT = '    '
+
+
+def add_parser(subparsers):
+    """
+    Add the CLI argument parser for this submodule
+    """
+    parser = subparsers.add_parser('tree',
+                                   help='print everything needed to craft a named Item')
+    parser.add_argument('-q', '--quantity', choices=sorted(QUANTITY_TIERS, key=QUANTITY_TIERS.get),
+                        default='single',
+                        help='crafting tier (default: single)')
+    parser.add_argument('-n', '--amount', type=int, default=1,
+                        help='number of items to make (default: 1)')
+    parser.add_argument('-d', '--depth', type=int,
+                        help='print the tree down to DEPTH levels of ingredients')
+    parser.add_argument('-r', '--raw', action='store_true',
+                        help='print only the total of each raw material')
+    parser.add_argument('item_name',
+                        help='name of the item')
+    parser.set_defaults(func=print_tree)
+
+
+def _format_node(node, amount):
+    """
+    Format a line of the tree: the amount of an item and how it is crafted.
+    """
+    if node.is_raw:
+        return '{} {}'.format(amount, node.name)
+    crafts = -(-amount // node.produces)
+    machine = node.recipe.machine.display_name if node.recipe.machine else 'hand'
+    return '{} {} ({} x {})'.format(amount, node.name, crafts, machine)
+
+
+def format_tree(root, amount=1, depth=None):
+    """
+    Format the crafting tree of a node as indented lines.
+
+    A sub-tree used more than once is only expanded the first time.
+    """
+    lines = []
+    expanded = set()
+    stack = [(root, amount, 0)]
+    while stack:
+        node, needed, level = stack.pop()
+        line = INDENT * level + _format_node(node, needed)
+        if node.inputs and node in expanded:
+            lines.append(line + ' ...')
+            continue
+        lines.append(line)
+        if depth is not None and level >= depth:
+            continue
+        expanded.add(node)
+        crafts = -(-needed // node.produces)
+        for source, count in reversed(node.inputs):
+            stack.append((source, crafts * count, level + 1))
+    return lines
+
+
+def print_tree(args):
+    """
+    Print the crafting tree
+    """
+    LOG.info('crafting tree for %d "%s" (%s)', args.amount, args.item_name, args.quantity)
+
+    database = Database(args.database, args.db_profile)
+    snapshot = CatalogSnapshot(database.session())
+    item = snapshot.item_named(args.item_name)
+    if item is None:
+        LOG.error('no item matches "%s"', args.item_name)
+        exit(1)
+
+    trees = CraftingTrees(snapshot, QUANTITY_TIERS[args.quantity])
+    for cycle in trees.cycles:
+        LOG.info('cycle cut: %s', ' -> '.join(member.name() for member in cycle))
+
+    if not args.raw:
+        for line in format_tree(trees.node(item), args.amount, args.depth):
+            print(line)
+        print()
+    for node, amount in trees.raw_materials(item, args.amount):
+        print('{} {}'.format(amount, node.name))
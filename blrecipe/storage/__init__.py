@@ -3,37 +3,51 @@ blrecipe storage subpackage
 
 This module provides a persistent data store of the various recipes for Boundless.
 """
-from .database import Database
+from .database import Database, PROFILES
 from .attrbundle import AttrBundle, AttrBundleGroup
 from .attrconstant import AttrConstant
 from .attrmodifier import AttrModifier
 from .attrarchetype import AttrArchetype
+from .crafting import CraftingNode, CraftingTrees, QUANTITY_TIERS
 from .item import Item
+from .itemuse import ItemUse, all_item_uses, rebuild_item_uses
 from .language import Language
+from .loadstate import SourceFile, RecordHash
 from .machine import Machine
 from .quantity import Quantity
 from .recipe import Recipe
 from .recipe_ingredient import Ingredient, IngredientGroup
 from .recipe_quantity import RecipeQuantity
 from .resourcetag import ResourceTag
+from .snapshot import CatalogSnapshot
 from .translation import Translation, i18n, ItemName, MetalName
 
 __all__ = ['Database',
+           'PROFILES',
+           'QUANTITY_TIERS',
            'AttrArchetype',
            'AttrBundle',
            'AttrBundleGroup',
            'AttrConstant',
            'AttrModifier',
+           'CatalogSnapshot',
+           'CraftingNode',
+           'CraftingTrees',
            'Item',
            'ItemName',
+           'ItemUse',
            'Language',
            'Machine',
            'MetalName',
            'Quantity',
            'Recipe',
+           'RecordHash',
            'Ingredient',
            'IngredientGroup',
            'RecipeQuantity',
            'ResourceTag',
+           'SourceFile',
            'Translation',
-           'i18n', ]
+           'all_item_uses',
+           'i18n',
+           'rebuild_item_uses', ]
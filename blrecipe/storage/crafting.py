@@ -0,0 +1,204 @@
+"""
+Crafting Trees
+
+Expand items into everything needed to craft them, down to raw materials,
+for one quantity tier (single, bulk or mass) of a catalogue snapshot.
+
+Each item is crafted by the first of its recipes that has the tier.  The
+recipes of a tier form a graph from each item to its ingredients, which is
+searched once: edges closing a cycle are cut, the ingredient being taken as
+a raw material there, and the items are numbered in a topological order,
+products before their ingredients.  An item has a single node in the graph
+whatever uses it, so shared sub-trees are only built once.
+
+Amounts are crafted in whole batches.  Expanding an item visits the items it
+needs in topological order, so each is crafted once for the total demanded
+by all of its products.
+
+    trees = CraftingTrees(snapshot, QUANTITY_TIERS['bulk'])
+    for node, amount in trees.raw_materials(item, 10):
+        print(amount, node.name)
+"""
+from heapq import heappop, heappush
+
+
+# Quantity IDs of the crafting tiers
+QUANTITY_TIERS = {
+    'single': 0,
+    'bulk': 1,
+    'mass': 2,
+}
+
+
+class CraftingNode(object):  # pylint: disable=too-few-public-methods
+    """
+    An item crafted by a recipe, or a raw material: an item, or a group of
+    alternative items, that is not crafted.
+    """
+
+    __slots__ = ('item', 'group_name', 'recipe', 'produces', 'inputs', 'index')
+
+    def __init__(self, item=None, group_name=None, recipe=None, produces=1):
+        self.item = item
+        self.group_name = group_name
+        self.recipe = recipe
+        self.produces = produces
+        # (node, amount per craft) of each ingredient
+        self.inputs = ()
+        # Position in the topological order, raw materials last
+        self.index = 0
+
+    def __repr__(self):
+        return '<CraftingNode {}{}>'.format(self.name, '' if self.recipe else ' (raw)')
+
+    @property
+    def name(self):
+        """Get the (localized) display name of the item or group."""
+        return self.group_name if self.group_name else self.item.name()
+
+    @property
+    def is_raw(self):
+        """Check whether the node is a raw material."""
+        return self.recipe is None
+
+
+def _tier_recipe(item, quantity_id):
+    """
+    Get the recipe crafting an item in a tier, with the amount it produces,
+    or (None, 0).
+    """
+    for recipe in item.recipes:
+        for quantity in recipe.quantities:
+            if quantity.quantity.quantity_id == quantity_id and quantity.produces > 0:
+                return recipe, quantity.produces
+    return None, 0
+
+
+class CraftingTrees(object):
+    """
+    The crafting graph of a catalogue snapshot for one quantity tier.
+    """
+
+    def __init__(self, snapshot, quantity_id=QUANTITY_TIERS['single']):
+        self.quantity_id = quantity_id
+        self._leaves = {}
+        self._groups = {}
+        # Lists of the items forming each cycle found
+        self.cycles = []
+
+        self._nodes = {}
+        for item in snapshot.items.values():
+            recipe, produces = _tier_recipe(item, quantity_id)
+            if recipe is not None:
+                self._nodes[item.id] = CraftingNode(item, recipe=recipe, produces=produces)
+        self.order = self._link()
+        self._results = {}
+
+    def _ingredients(self, node):
+        """
+        Get the (crafted item ID or raw node, amount) of each ingredient of
+        a crafted node in its tier.
+        """
+        for ingredient in node.recipe.ingredients:
+            if ingredient.quantity is None or ingredient.quantity.quantity_id != self.quantity_id:
+                continue
+            if ingredient.group_name:
+                yield self._group(ingredient.group_name), ingredient.amount
+            elif ingredient.item.id in self._nodes:
+                yield ingredient.item.id, ingredient.amount
+            else:
+                yield self._leaf(ingredient.item), ingredient.amount
+
+    def _leaf(self, item):
+        if item.id not in self._leaves:
+            self._leaves[item.id] = CraftingNode(item)
+        return self._leaves[item.id]
+
+    def _group(self, group_name):
+        if group_name not in self._groups:
+            self._groups[group_name] = CraftingNode(group_name=group_name)
+        return self._groups[group_name]
+
+    def _link(self):
+        """
+        Link each crafted node to its ingredients, cutting cycles, and get
+        the nodes in topological order.
+        """
+        postorder = []
+        state = {}  # item ID: 1 while being searched, 2 once done
+        for root in sorted(self._nodes):
+            if root in state:
+                continue
+            state[root] = 1
+            path = [root]
+            stack = [(root, self._ingredients(self._nodes[root]), [])]
+            while stack:
+                item_id, pending, inputs = stack[-1]
+                for target, amount in pending:
+                    if isinstance(target, CraftingNode):
+                        inputs.append((target, amount))
+                    elif state.get(target) == 2:
+                        inputs.append((self._nodes[target], amount))
+                    elif state.get(target) == 1:
+                        self.cycles.append([self._nodes[i].item
+                                            for i in path[path.index(target):]])
+                        inputs.append((self._leaf(self._nodes[target].item), amount))
+                    else:
+                        inputs.append((self._nodes[target], amount))
+                        state[target] = 1
+                        path.append(target)
+                        stack.append((target, self._ingredients(self._nodes[target]), []))
+                        break
+                else:
+                    stack.pop()
+                    path.pop()
+                    state[item_id] = 2
+                    node = self._nodes[item_id]
+                    node.inputs = tuple(inputs)
+                    postorder.append(node)
+
+        order = postorder[::-1]
+        order.extend(self._leaves.values())
+        order.extend(self._groups.values())
+        for index, node in enumerate(order):
+            node.index = index
+        return order
+
+    def node(self, item):
+        """
+        Get the node of an item: its crafting tree in this tier.
+        """
+        return self._nodes.get(item.id) or self._leaf(item)
+
+    def expand(self, item, amount=1):
+        """
+        Get the amount of every item needed to make an amount of an item,
+        itself included, as (node, amount) pairs in topological order.
+        """
+        key = (item.id, amount)
+        if key not in self._results:
+            root = self.node(item)
+            demand = {root: amount}
+            queue = [(root.index, root)]
+            result = []
+            while queue:
+                _, node = heappop(queue)
+                needed = demand[node]
+                result.append((node, needed))
+                crafts = -(-needed // node.produces)
+                for source, count in node.inputs:
+                    if source not in demand:
+                        demand[source] = 0
+                        heappush(queue, (source.index, source))
+                    demand[source] += crafts * count
+            self._results[key] = result
+        return self._results[key]
+
+    def raw_materials(self, item, amount=1):
+        """
+        Get the amount of each raw material needed to make an amount of an
+        item, as (node, amount) pairs sorted by name.
+        """
+        return sorted(((node, needed) for node, needed in self.expand(item, amount)
+                       if node.is_raw),
+                      key=lambda pair: pair[0].name)
@@ -1,9 +1,13 @@
 """
 The database isolation layer
 """
-from sqlalchemy import create_engine, inspect
+import itertools
+import os
+from collections import namedtuple
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 # A base class for all data models cached in persisten storage
 BaseObject = declarative_base()  # pylint: disable=invalid-name
@@ -11,22 +15,153 @@ BaseObject = declarative_base()  # pylint: disable=invalid-name
 # Global factory object for creating sessions
 Session = sessionmaker()  # pylint: disable=invalid-name
 
+# Environment variables selecting the database and its profile
+URL_VARIABLE = 'BLRECIPE_DATABASE'
+PROFILE_VARIABLE = 'BLRECIPE_DB_PROFILE'
+
+DEFAULT_URL = 'sqlite:///blrecipe.db'
+DEFAULT_PROFILE = 'default'
+
+# Connection settings tuned for a use of the database.  The url, if any,
+# replaces the configured database; pragmas are issued on every new SQLite
+# connection.
+Profile = namedtuple('Profile', ['url', 'pragmas'])
+
+PROFILES = {
+    DEFAULT_PROFILE: Profile(None, []),
+    # Loading a release: loads are incremental and resume from the last
+    # commit, so the file must survive a crash.  Writes go through the WAL,
+    # only synced at checkpoints, with a large cache and temporary tables in
+    # memory.
+    'bulk-load': Profile(None, [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -256 * 1024),
+        ('temp_store', 'MEMORY'),
+    ]),
+    # Serving lookups: readers never block each other nor a loader writing
+    # through the WAL, and pages are read straight from the mapped file.
+    'read-serving': Profile(None, [
+        ('journal_mode', 'WAL'),
+        ('mmap_size', 1 << 30),
+        ('cache_size', -64 * 1024),
+        ('query_only', 'ON'),
+    ]),
+    # A private, empty database for tests and benchmarks, named so that
+    # pooled connections all open the same one
+    'memory': Profile('sqlite:///file:blrecipe-{}?mode=memory&cache=shared&uri=true', []),
+}
+
+# Connections kept open for readers, and opened beyond those under load
+READER_POOL_SIZE = 8
+READER_POOL_OVERFLOW = 8
+
+# Suffixes keeping each in-memory database private
+_MEMORY_IDS = itertools.count()
+
+
+def database_url(url=None, profile=DEFAULT_PROFILE):
+    """
+    Get the URL of the database to open: the one the profile requires, the
+    one given, the one in the environment or the default, in that order.
+    """
+    if PROFILES[profile].url:
+        return PROFILES[profile].url.format(next(_MEMORY_IDS))
+    return url or os.environ.get(URL_VARIABLE) or DEFAULT_URL
+
+
+def database_profile(profile=None):
+    """
+    Get the name of the profile to use: the one given, the one in the
+    environment or the default, in that order.
+    """
+    profile = profile or os.environ.get(PROFILE_VARIABLE) or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError('unknown database profile "{}"'.format(profile))
+    return profile
+
+
+def _execute_pragmas(cursor, pragmas):
+    for name, value in pragmas:
+        cursor.execute('PRAGMA {} = {}'.format(name, value))
+
+
+def apply_profile(engine, profile, read_only=False):
+    """
+    Issue the pragmas of a profile on the connections an engine makes,
+    making them read-only if asked.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = PROFILES[profile].pragmas + ([('query_only', 'ON')] if read_only else [])
+
+    if pragmas:
+        @event.listens_for(engine, 'connect')
+        def _connect(dbapi_connection, connection_record):  # pylint: disable=unused-variable,unused-argument
+            cursor = dbapi_connection.cursor()
+            _execute_pragmas(cursor, pragmas)
+            cursor.close()
+
+
+def ensure_schema(bind):
+    """
+    Create whatever tables and indexes of the data models are missing.
+
+    Databases written by an earlier version are migrated in place: new
+    tables are created and indexes added to existing tables.
+    """
+    insp = inspect(bind)
+    if not set(BaseObject.metadata.tables).issubset(insp.get_table_names()):
+        BaseObject.metadata.create_all(bind)
+        insp = inspect(bind)
+    existing = _index_names(bind, insp)
+    for table in BaseObject.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind)
+
+
+def _index_names(bind, insp):
+    """
+    Get the names of all indexes in a database.
+
+    SQLite lists them all in one catalogue query rather than two PRAGMAs per
+    table and index, which matters as the schema is checked on every start.
+    """
+    if bind.dialect.name == 'sqlite':
+        return {name for (name,) in bind.execute("SELECT name FROM sqlite_master "
+                                                 "WHERE type = 'index'")}
+    return {index['name']
+            for table in insp.get_table_names()
+            for index in insp.get_indexes(table)}
+
 
 class Database(object):  # pylint: disable=too-few-public-methods
     """
     Encapsulate the RDBMS used as a persistent store
+
+    The database and the profile its connections are tuned with default to
+    the BLRECIPE_DATABASE and BLRECIPE_DB_PROFILE environment variables.
     """
 
-    def __init__(self):
-#        self._engine = create_engine("sqlite:///blrecipe.db", echo="debug")
-        self._engine = create_engine("sqlite:///blrecipe.db")
+    def __init__(self, url=None, profile=None):
+        self.profile = database_profile(profile)
+        self.url = database_url(url, self.profile)
+        self._engine = create_engine(self.url)
+        apply_profile(self._engine, self.profile)
         self._connection = self._engine.connect()
         self._ensure_db_exists()
+        self._reader_engine = None
 
     def _ensure_db_exists(self):
-        insp = inspect(self._engine)
-        if 'Machine' not in insp.get_table_names():
-            BaseObject.metadata.create_all(self._engine)
+        if self._engine.dialect.name != 'sqlite':
+            ensure_schema(self._connection)
+            return
+        # The profile may have made the connection read-only
+        query_only = self._connection.execute('PRAGMA query_only').scalar()
+        self._connection.execute('PRAGMA query_only = OFF')
+        ensure_schema(self._connection)
+        self._connection.execute('PRAGMA query_only = {}'.format(query_only))
 
     def session(self):
         """
@@ -34,8 +169,34 @@ class Database(object):  # pylint: disable=too-few-public-methods
         """
         return Session(bind=self._connection)
 
+    def readers(self, scopefunc=None):
+        """
+        Get a registry of read-only sessions that can be used concurrently.
+
+        Each thread, or each scope scopefunc identifies such as a web request,
+        gets its own session, drawing connections from a pool shared by all.
+        Call remove() on the registry at the end of each scope to return the
+        session's connection to the pool.
+        """
+        if self._reader_engine is None:
+            if self._engine.dialect.name == 'sqlite':
+                # Pooled connections are handed from one thread to another
+                self._reader_engine = create_engine(self.url,
+                                                    poolclass=QueuePool,
+                                                    pool_size=READER_POOL_SIZE,
+                                                    max_overflow=READER_POOL_OVERFLOW,
+                                                    connect_args={'check_same_thread': False})
+            else:
+                self._reader_engine = create_engine(self.url,
+                                                    pool_size=READER_POOL_SIZE,
+                                                    max_overflow=READER_POOL_OVERFLOW)
+            apply_profile(self._reader_engine, self.profile, read_only=True)
+        return scoped_session(sessionmaker(bind=self._reader_engine), scopefunc=scopefunc)
+
     def close(self):
         """
-        Tear down the database connection
+        Tear down the database connections
         """
+        if self._reader_engine is not None:
+            self._reader_engine.dispose()
         self._connection.close()
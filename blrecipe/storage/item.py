@@ -2,10 +2,11 @@
 Items
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, or_
-from sqlalchemy.orm import relationship, object_session
+from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.orm import relationship, object_session, foreign
+from sqlalchemy.orm.collections import attribute_mapped_collection
 from .database import BaseObject
-from .recipe_ingredient import Ingredient, IngredientGroup
+from .itemuse import item_uses
 from .translation import ItemName, Translation
 
 
@@ -27,6 +28,17 @@ class Item(BaseObject):  # pylint: disable=too-few-public-methods
     list_type_tr = relationship('Translation', foreign_keys=[list_type_id])
     recipes = relationship('Recipe')
 
+    # Localized names and descriptions, keyed by language
+    names = relationship(ItemName,
+                         primaryjoin=lambda: Item.id == foreign(ItemName.item_id),
+                         collection_class=attribute_mapped_collection('lang'),
+                         viewonly=True)
+    descriptions = relationship(Translation,
+                                primaryjoin=lambda: (foreign(Translation.string_id)
+                                                     == Item.string_id + '_DESCRIPTION'),
+                                collection_class=attribute_mapped_collection('lang'),
+                                viewonly=True)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -37,10 +49,7 @@ class Item(BaseObject):  # pylint: disable=too-few-public-methods
         """
         Get the (localized) display name of the item.
         """
-        result = object_session(self).query(ItemName)\
-                                     .filter_by(item_id=self.id,
-                                                lang=language)\
-                                     .first()
+        result = self.names.get(language)
         if result is not None:
             return result.name
         return '[[unknown]]'
@@ -57,9 +66,7 @@ class Item(BaseObject):  # pylint: disable=too-few-public-methods
         """
         Get the (localized) description of the item.
         """
-        result = object_session(self).query(Translation)\
-                                     .filter_by(string_id=self.description_id)\
-                                     .first()
+        result = self.descriptions.get('english') or next(iter(self.descriptions.values()), None)
         if result is not None:
             return result.value
         return ''
@@ -68,10 +75,7 @@ class Item(BaseObject):  # pylint: disable=too-few-public-methods
         """
         Get the (localized) subtitle of the item.
         """
-        result = object_session(self).query(ItemName)\
-                                     .filter_by(item_id=self.id,
-                                                lang=language)\
-                                     .first()
+        result = self.names.get(language)
         if result is not None:
             return result.subtitle
         return ''
@@ -89,24 +93,7 @@ class Item(BaseObject):  # pylint: disable=too-few-public-methods
         Get the uses (noun, as in 'Used In') for the item.
 
         An item may be an explicit ingredient in a recipe or as an alternative
-        in a group ingredient.
-
-        There is probably a better way to do this using a single query with a
-        join but this works for now.
+        in a group ingredient.  Both are materialized in the ItemUse table when
+        recipes are loaded, so this is a single indexed lookup.
         """
-        group_rows = object_session(self).query(IngredientGroup)\
-                                         .filter_by(item_id=self.id)\
-                                         .all()
-        if len(group_rows) > 0:
-            group_names = [group.name for group in group_rows]
-            result = object_session(self).query(Ingredient)\
-                                         .filter(or_(Ingredient.item_id==self.id,
-                                                     Ingredient.group_name.in_(group_names)))\
-                                         .all()
-        else:
-            result = object_session(self).query(Ingredient)\
-                                         .filter(Ingredient.item_id==self.id)\
-                                         .all()
-        return sorted({use.recipe.item.name() for use in result})
-
-
+        return item_uses(object_session(self), self.id)
@@ -0,0 +1,100 @@
+"""
+Item Uses
+
+The "Used In" relation, materialized at load time: which recipes consume an
+item, either directly or as a member of a group ingredient.
+"""
+
+from sqlalchemy import Column, Index, Integer, ForeignKey, UniqueConstraint, and_, event, select
+from sqlalchemy import union
+from .database import BaseObject, Session
+from .recipe import Recipe
+from .recipe_ingredient import Ingredient, IngredientGroup
+from .translation import ItemName
+
+
+class ItemUse(BaseObject):  # pylint: disable=too-few-public-methods
+    """
+    A recipe consuming an item, with the item the recipe outputs.
+    """
+
+    __tablename__ = 'ItemUse'
+    __table_args__ = (UniqueConstraint('item_id', 'recipe_id'),
+                      Index('ix_ItemUse_item_output', 'item_id', 'output_item_id'))
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    item_id = Column(Integer, ForeignKey('Item.id'), nullable=False)
+    recipe_id = Column(Integer, ForeignKey('Recipe.id'), nullable=False)
+    output_item_id = Column(Integer, ForeignKey('Item.id'), nullable=False)
+
+    def __init__(self, item_id, recipe_id, output_item_id):
+        self.item_id = item_id
+        self.recipe_id = recipe_id
+        self.output_item_id = output_item_id
+
+    def __repr__(self):
+        return '<ItemUse item:{} recipe:{}>'.format(self.item_id, self.recipe_id)
+
+
+def rebuild_item_uses(session):
+    """
+    Replace the contents of the ItemUse table with the uses found in the
+    recipes, in a single INSERT ... SELECT.
+    """
+    direct = select([Ingredient.item_id.label('item_id'),
+                     Recipe.id.label('recipe_id'),
+                     Recipe.item_id.label('output_item_id')])\
+        .where(and_(Ingredient.recipe_id == Recipe.id,
+                    Ingredient.item_id.isnot(None)))
+    grouped = select([IngredientGroup.item_id.label('item_id'),
+                      Recipe.id.label('recipe_id'),
+                      Recipe.item_id.label('output_item_id')])\
+        .where(and_(Ingredient.recipe_id == Recipe.id,
+                    Ingredient.group_name == IngredientGroup.name,
+                    IngredientGroup.item_id.isnot(None)))
+    session.query(ItemUse).delete(synchronize_session=False)
+    session.execute(ItemUse.__table__.insert()
+                    .from_select(['item_id', 'recipe_id', 'output_item_id'],
+                                 union(direct, grouped)))
+
+
+@event.listens_for(BaseObject.metadata, 'after_create')
+def _existing_uses(target, connection, tables=(), **kw):  # pylint: disable=unused-argument
+    """
+    Fill the ItemUse table when it is added to a database that already
+    holds recipes, which would otherwise have no uses until the next load.
+    """
+    if ItemUse.__table__ in tables and Recipe.__table__ not in tables:
+        session = Session(bind=connection)
+        rebuild_item_uses(session)
+        session.commit()
+
+
+def _use_names(session, language, item_ids=None):
+    """
+    Query the (item ID, name of an item made from it) pairs.
+    """
+    query = session.query(ItemUse.item_id, ItemName.name)\
+                   .outerjoin(ItemName, and_(ItemName.item_id == ItemUse.output_item_id,
+                                             ItemName.lang == language))
+    if item_ids is not None:
+        query = query.filter(ItemUse.item_id.in_(item_ids))
+    return query.distinct()
+
+
+def item_uses(session, item_id, language='english'):
+    """
+    Get the sorted names of the items made from an item.
+    """
+    return sorted({name if name is not None else '[[unknown]]'
+                   for _, name in _use_names(session, language, [item_id])})
+
+
+def all_item_uses(session, language='english'):
+    """
+    Get the sorted names of the items made from each item, by item ID, for
+    the whole catalogue in one query.
+    """
+    uses = {}
+    for item_id, name in _use_names(session, language):
+        uses.setdefault(item_id, set()).add(name if name is not None else '[[unknown]]')
+    return {item_id: sorted(names) for item_id, names in uses.items()}
@@ -0,0 +1,53 @@
+"""
+Load state
+
+Content hashes of the game files and of the individual records loaded from
+them, so a reload for a new release only touches what actually changed.
+"""
+
+from sqlalchemy import Column, Integer, String, UniqueConstraint
+from .database import BaseObject
+
+
+class SourceFile(BaseObject):  # pylint: disable=too-few-public-methods
+    """
+    A game file that has been loaded, with the hash of its content.
+    """
+
+    __tablename__ = 'SourceFile'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(64), unique=True, nullable=False)
+    digest = Column(String(64), nullable=False)
+    release = Column(String(16))
+
+    def __init__(self, name, digest, release=None):
+        self.name = name
+        self.digest = digest
+        self.release = release
+
+    def __repr__(self):
+        return '<SourceFile "{}" release={}>'.format(self.name, self.release)
+
+
+class RecordHash(BaseObject):  # pylint: disable=too-few-public-methods
+    """
+    The hash of a single record loaded from a game file.
+
+    The key is whatever identifies the record within its source file, e.g. the
+    string ID of a translation or the ID of an item.
+    """
+
+    __tablename__ = 'RecordHash'
+    __table_args__ = (UniqueConstraint('source', 'key'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(64), nullable=False)
+    key = Column(String(128), nullable=False)
+    digest = Column(String(40), nullable=False)
+
+    def __init__(self, source, key, digest):
+        self.source = source
+        self.key = key
+        self.digest = digest
+
+    def __repr__(self):
+        return '<RecordHash {}:{}>'.format(self.source, self.key)
@@ -14,7 +14,7 @@ class Recipe(BaseObject):  # pylint: disable=too-few-public-methods
 
     __tablename__ = 'Recipe'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    item_id = Column(Integer, ForeignKey('Item.id'), nullable=False)
+    item_id = Column(Integer, ForeignKey('Item.id'), nullable=False, index=True)
     machine_id = Column(Integer, ForeignKey('Machine.id'))
     experience = Column(Integer, nullable=False, default=0)
     heat = Column(Integer, nullable=False, default=0)
@@ -16,9 +16,9 @@ class Ingredient(BaseObject):  # pylint: disable=too-few-public-methods
     """
     __tablename__ = 'Ingredient'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    recipe_id = Column(Integer, ForeignKey('Recipe.id'))
-    item_id = Column(Integer, ForeignKey('Item.id'))
-    group_name = Column(Integer, ForeignKey('IngredientGroup.name'))
+    recipe_id = Column(Integer, ForeignKey('Recipe.id'), index=True)
+    item_id = Column(Integer, ForeignKey('Item.id'), index=True)
+    group_name = Column(Integer, ForeignKey('IngredientGroup.name'), index=True)
     quantity_id = Column(Integer, ForeignKey('Quantity.id'))
     amount = Column(Integer, nullable=False, default=0)
 
@@ -47,8 +47,8 @@ class IngredientGroup(BaseObject):  # pylint: disable=too-few-public-methods
     """
     __tablename__ = 'IngredientGroup'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(32), nullable=False)
-    item_id = Column(Integer, ForeignKey('Item.id'))
+    name = Column(String(32), nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey('Item.id'), index=True)
 
     item = relationship('Item')
 
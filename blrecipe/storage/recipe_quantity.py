@@ -15,7 +15,7 @@ class RecipeQuantity(BaseObject):  # pylint: disable=too-few-public-methods
     """
     __tablename__ = 'ReciepQuantity'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    recipe_id = Column(Integer, ForeignKey('Recipe.id'))
+    recipe_id = Column(Integer, ForeignKey('Recipe.id'), index=True)
     quantity_id = Column(Integer, ForeignKey('Quantity.id'))
     spark = Column(Integer, nullable=False, default=0)
     wear = Column(Integer, nullable=False, default=0)
@@ -37,5 +37,5 @@ class RecipeQuantity(BaseObject):  # pylint: disable=too-few-public-methods
 
     def __repr__(self):
         return ('<RecipeQuantity recipe:{} quantity:{}>'
-                .format(self.recipe.item.name,
+                .format(self.recipe.item.name(),
                         self.quantity.name))
@@ -14,7 +14,7 @@ class ResourceTag(BaseObject):  # pylint: disable=too-few-public-methods
 
     __tablename__ = 'ResourceTag'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    string_id = Column(String(64), ForeignKey('Translation.string_id'))
+    string_id = Column(String(64), ForeignKey('Translation.string_id'), index=True)
     found_altitude = Column(String(64), nullable=False)
     found_depth = Column(String(64), nullable=False)
     found_material = Column(String(64), nullable=False)
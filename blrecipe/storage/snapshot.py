@@ -0,0 +1,330 @@
+"""
+Catalogue Snapshot
+
+A read-only, in-memory copy of the catalogue.  The data only changes when a
+release is loaded and is read far more often, so it is loaded once, table by
+table, into plain records that are then used without any further queries.
+
+The records have the attributes and methods of the storage models that the
+recipe formatting uses, so either can be rendered.
+
+    snapshot = CatalogSnapshot(session)
+    item = snapshot.item_named('Rough Oortstone')
+    for recipe in item.recipes:
+        print(format_recipe_wiki(recipe))
+"""
+from sqlalchemy import and_
+from .item import Item
+from .itemuse import all_item_uses
+from .machine import Machine
+from .quantity import Quantity
+from .recipe import Recipe
+from .recipe_ingredient import Ingredient, IngredientGroup
+from .recipe_quantity import RecipeQuantity
+from .resourcetag import ResourceTag
+from .translation import ItemName, Translation
+
+
+class QuantityRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    A recipe quantity (single, bulk, mass).
+    """
+
+    __slots__ = ('quantity_id', 'string_id', 'name')
+
+    def __init__(self, quantity_id, string_id, name):
+        self.quantity_id = quantity_id
+        self.string_id = string_id
+        self.name = name
+
+    def __repr__(self):
+        return '<Quantity {}>'.format(self.name)
+
+    def __lt__(self, rhs):
+        return self.quantity_id < rhs.quantity_id
+
+
+class MachineRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    A crafting machine.
+    """
+
+    __slots__ = ('id', 'name', 'string_id', 'display_name')
+
+    def __init__(self, machine_id, name, string_id, display_name):
+        self.id = machine_id  # pylint: disable=invalid-name
+        self.name = name
+        self.string_id = string_id
+        self.display_name = display_name
+
+    def __repr__(self):
+        return self.string_id
+
+
+class ItemRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    An item, with its localized names and the recipes making it.
+    """
+
+    __slots__ = ('id', 'string_id', 'build_xp', 'mine_xp', 'prestige', 'coin_value',
+                 'list_type', 'max_stack_size', 'names', 'descriptions', 'recipes', 'uses')
+
+    def __init__(self, item_id, string_id, build_xp, mine_xp, prestige, coin_value,
+                 list_type, max_stack_size):
+        self.id = item_id  # pylint: disable=invalid-name
+        self.string_id = string_id
+        self.build_xp = build_xp
+        self.mine_xp = mine_xp
+        self.prestige = prestige
+        self.coin_value = coin_value
+        self.list_type = list_type
+        self.max_stack_size = max_stack_size
+        # (name, subtitle) and description by language
+        self.names = {}
+        self.descriptions = {}
+        self.recipes = []
+        self.uses = []
+
+    def __repr__(self):
+        return '<Item {} ({})>'.format(self.id, self.name(language='english'))
+
+    def name(self, language='english'):
+        """
+        Get the (localized) display name of the item.
+        """
+        result = self.names.get(language)
+        return result[0] if result is not None else '[[unknown]]'
+
+    def subtitle(self, language='english'):
+        """
+        Get the (localized) subtitle of the item.
+        """
+        result = self.names.get(language)
+        return result[1] if result is not None else ''
+
+    @property
+    def description_id(self):
+        """
+        Get the translation key for the item desciption.
+        """
+        return self.string_id + '_DESCRIPTION'
+
+    @property
+    def description(self):
+        """
+        Get the (localized) description of the item.
+        """
+        return (self.descriptions.get('english')
+                or next(iter(self.descriptions.values()), ''))
+
+
+class RecipeRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    A recipe, with its ingredients and quantities.
+    """
+
+    __slots__ = ('id', 'item', 'machine', 'experience', 'heat', 'handcraftable', 'power',
+                 'attribute', 'attribute_level', 'ingredients', 'quantities')
+
+    def __init__(self, recipe_id, item, machine, experience, heat, handcraftable, power,
+                 attribute, attribute_level):
+        self.id = recipe_id  # pylint: disable=invalid-name
+        self.item = item
+        self.machine = machine
+        self.experience = experience
+        self.heat = heat
+        self.handcraftable = handcraftable
+        self.power = power
+        self.attribute = attribute
+        self.attribute_level = attribute_level
+        self.ingredients = []
+        self.quantities = []
+
+    def __repr__(self):
+        return '<Recipe "{}">'.format(self.item.name(language="english"))
+
+
+class IngredientRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    An ingredient of a recipe: an item, or any of the items of a group.
+    """
+
+    __slots__ = ('item', 'group_name', 'group', 'quantity', 'amount')
+
+    def __init__(self, item, group_name, group, quantity, amount):
+        self.item = item
+        self.group_name = group_name
+        self.group = group
+        self.quantity = quantity
+        self.amount = amount
+
+    @property
+    def display_name(self):
+        """Get the (localized) display name of the ingredient."""
+        return self.group_name if self.group_name else self.item.name()
+
+
+class RecipeQuantityRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    The requirements and output of a recipe for a quantity.
+    """
+
+    __slots__ = ('quantity', 'spark', 'wear', 'duration', 'produces')
+
+    def __init__(self, quantity, spark, wear, duration, produces):
+        self.quantity = quantity
+        self.spark = spark
+        self.wear = wear
+        self.duration = duration
+        self.produces = produces
+
+    @property
+    def display_name(self):
+        """Get the (localized) display name of the quantity."""
+        return self.quantity.name
+
+
+class ResourceTagRecord(object):  # pylint: disable=too-few-public-methods
+    """
+    Where a resource is found.
+    """
+
+    __slots__ = ('string_id', 'found_altitude', 'found_depth', 'found_material')
+
+    def __init__(self, string_id, found_altitude, found_depth, found_material):
+        self.string_id = string_id
+        self.found_altitude = found_altitude
+        self.found_depth = found_depth
+        self.found_material = found_material
+
+
+class CatalogSnapshot(object):
+    """
+    The items, recipes and everything they refer to, read from a session in
+    one query per table.
+    """
+
+    def __init__(self, session, language='english'):
+        self.language = language
+        # The first item given each name, as when querying ItemName
+        self._names = {}
+        self.quantities = self._load_quantities(session)
+        self.machines = self._load_machines(session)
+        self.items = self._load_items(session)
+        self.groups = self._load_groups(session)
+        self.recipes = self._load_recipes(session)
+        self.resource_tags = {row[0]: ResourceTagRecord(*row)
+                              for row in session.query(ResourceTag.string_id,
+                                                       ResourceTag.found_altitude,
+                                                       ResourceTag.found_depth,
+                                                       ResourceTag.found_material)}
+        for item_id, uses in all_item_uses(session, language).items():
+            if item_id in self.items:
+                self.items[item_id].uses = uses
+
+    def _translated(self, session, *columns):
+        """
+        Query columns with the translation of their first column's string ID.
+        """
+        return session.query(*columns, Translation.value)\
+                      .outerjoin(Translation, and_(Translation.string_id == columns[0],
+                                                   Translation.lang == self.language))
+
+    def _load_quantities(self, session):
+        return {quantity_id: QuantityRecord(quantity_id, string_id,
+                                            value.lower() if value else string_id.lower())
+                for string_id, quantity_id, value
+                in self._translated(session, Quantity.string_id, Quantity.quantity_id)}
+
+    def _load_machines(self, session):
+        return {machine_id: MachineRecord(machine_id, name, string_id, value or string_id)
+                for string_id, machine_id, name, value
+                in self._translated(session, Machine.string_id, Machine.id, Machine.name)}
+
+    def _load_items(self, session):
+        items = {}
+        for row in self._translated(session, Item.list_type_id, Item.id, Item.string_id,
+                                    Item.build_xp, Item.mine_xp, Item.prestige,
+                                    Item.coin_value, Item.max_stack_size):
+            _, item_id, string_id, build_xp, mine_xp, prestige, coin_value, stack, list_type \
+                = row
+            items[item_id] = ItemRecord(item_id, string_id, build_xp, mine_xp, prestige,
+                                        coin_value, list_type, stack)
+
+        query = session.query(ItemName.item_id, ItemName.lang, ItemName.name, ItemName.subtitle)
+        for item_id, lang, name, subtitle in query.order_by(ItemName.id):
+            item = items.get(item_id)
+            if item is not None:
+                item.names[lang] = (name, subtitle)
+                self._names.setdefault((lang, name), item)
+
+        query = session.query(Item.id, Translation.lang, Translation.value)\
+                       .join(Translation, Translation.string_id == Item.string_id + '_DESCRIPTION')
+        for item_id, lang, value in query:
+            items[item_id].descriptions[lang] = value
+        return items
+
+    def _load_groups(self, session):
+        groups = {}
+        query = session.query(IngredientGroup.name, IngredientGroup.item_id)
+        for name, item_id in query.order_by(IngredientGroup.id):
+            if item_id in self.items:
+                groups.setdefault(name, []).append(self.items[item_id])
+        return {name: tuple(items) for name, items in groups.items()}
+
+    def _load_recipes(self, session):
+        # Recipes of missing items are skipped, as are group members
+        recipes = {}
+        query = session.query(Recipe.id, Recipe.item_id, Recipe.machine_id, Recipe.experience,
+                              Recipe.heat, Recipe.handcraftable, Recipe.power,
+                              Recipe.attribute, Recipe.attribute_level)
+        for row in query.order_by(Recipe.id):
+            recipe_id, item_id, machine_id = row[:3]
+            item = self.items.get(item_id)
+            if item is None:
+                continue
+            recipe = RecipeRecord(recipe_id, item, self.machines.get(machine_id), *row[3:])
+            recipes[recipe_id] = recipe
+            recipe.item.recipes.append(recipe)
+
+        query = session.query(RecipeQuantity.recipe_id, RecipeQuantity.quantity_id,
+                              RecipeQuantity.spark, RecipeQuantity.wear,
+                              RecipeQuantity.duration, RecipeQuantity.produces)
+        for recipe_id, quantity_id, spark, wear, duration, produces \
+                in query.order_by(RecipeQuantity.id):
+            if recipe_id not in recipes:
+                continue
+            recipes[recipe_id].quantities.append(
+                RecipeQuantityRecord(self.quantities[quantity_id], spark, wear, duration,
+                                     produces))
+
+        query = session.query(Ingredient.recipe_id, Ingredient.item_id, Ingredient.group_name,
+                              Ingredient.quantity_id, Ingredient.amount)
+        for recipe_id, item_id, group_name, quantity_id, amount \
+                in query.order_by(Ingredient.id):
+            item = self.items.get(item_id)
+            if recipe_id not in recipes or (item is None and not group_name):
+                continue
+            recipes[recipe_id].ingredients.append(
+                IngredientRecord(item, group_name,
+                                 self.groups.get(group_name, ()),
+                                 self.quantities.get(quantity_id), amount))
+        return recipes
+
+    def item(self, item_id):
+        """
+        Get an item by its ID, or None.
+        """
+        return self.items.get(item_id)
+
+    def item_named(self, name, language='english'):
+        """
+        Get an item by its (localized) name, or None.
+        """
+        return self._names.get((language, name))
+
+    def resource_tag(self, string_id):
+        """
+        Get the resource tags of an item's string ID, or None.
+        """
+        return self.resource_tags.get(string_id)
@@ -2,7 +2,7 @@
 I18N translations
 """
 
-from sqlalchemy import Column, Integer, String, UniqueConstraint
+from sqlalchemy import Column, Index, Integer, String, UniqueConstraint
 from .database import BaseObject
 
 
@@ -14,7 +14,7 @@ class Translation(BaseObject):  # pylint: disable=too-few-public-methods
     __table_args__ = (UniqueConstraint('lang', 'string_id'),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     lang = Column(String(32), nullable=False)
-    string_id = Column(String(64), nullable=False)
+    string_id = Column(String(64), nullable=False, index=True)
     value = Column(String(255), nullable=False)
 
     def __init__(self, string_id, lang=None, value=None):
@@ -38,10 +38,11 @@ class ItemName(BaseObject):   # pylint: disable=too-few-public-methods
     using the itemcolorstring translation.
     """
     __tablename__ = 'ItemName'
-    __table_args__ = (UniqueConstraint('lang', 'item_id'),)
+    __table_args__ = (UniqueConstraint('lang', 'item_id'),
+                      Index('ix_ItemName_lang_name', 'lang', 'name'))
     id = Column(Integer, primary_key=True, autoincrement=True)
     lang = Column(String(32), nullable=False)
-    item_id = Column(Integer, nullable=False)
+    item_id = Column(Integer, nullable=False, index=True)
     name = Column(String(255), nullable=False)
     subtitle = Column(String(255))
 
@@ -0,0 +1,262 @@
+"""
+Test the extract submodule
+"""
+import argparse
+import builtins
+import json
+import os
+import random
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+import msgpack
+from PIL import Image, ImageFilter
+from blrecipe.clt.extract import Extractor
+
+
+# Sprites as stored in atlas.msgpack: (name, uvs, channel)
+SPRITES = [
+    ('gui/icons/items/WOOD.png', [4, 4, 24, 24], 0),
+    ('gui/icons/blocks/ROCK.png', [36, 4, 24, 24], 1),
+    ('gui/icons/blocks/GLEAM.png', [4, 36, 20, 28], 2),
+    ('gui/cursors/ARROW.png', [36, 36, 16, 16], 0),
+]
+
+
+def _write_atlas_index(filename, sprites):
+    """
+    Write an atlas index in the game's key-table msgpack format.
+    """
+    keys = [b'sprites', b'name', b'uvs', b'channel']
+    data = {0: [{1: name.encode('utf-8'), 2: uvs, 3: channel} for name, uvs, channel in sprites]}
+    with open(filename, 'wb') as outfile:
+        msgpack.pack([data, keys], outfile, use_bin_type=False)
+
+
+def _legacy_icon(atlas, uvs, channel):
+    """
+    The original per-pixel icon construction the vectorized one replaces.
+    """
+    icon_img = atlas.crop((uvs[0], uvs[1], uvs[0] + uvs[2], uvs[1] + uvs[3]))
+    icon_img = icon_img.getchannel(channel)
+    icon_img = icon_img.filter(ImageFilter.UnsharpMask(radius=8, percent=96, threshold=48))
+    icon_img = icon_img.convert('LA')
+    icon_img.putdata([(item[0], item[0]) for item in icon_img.getdata()])
+    return icon_img
+
+
+class TestExtractor(TestCase):
+    """
+    Validate icon extraction from the texture atlas
+    """
+
+    def setUp(self):
+        self._tmpdir = TemporaryDirectory()
+        self.assetdir = os.path.join(self._tmpdir.name, 'assets')
+        self.outdir = os.path.join(self._tmpdir.name, 'icons')
+        os.makedirs(os.path.join(self.assetdir, 'gui'))
+
+        rng = random.Random(249)
+        self.atlas = Image.new('RGB', (64, 64))
+        self.atlas.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                            for _ in range(64 * 64)])
+        self.atlas.save(os.path.join(self.assetdir, 'gui', 'atlas.png'))
+        _write_atlas_index(os.path.join(self.assetdir, 'gui', 'atlas.msgpack'), SPRITES)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _extract(self, **options):
+        args = argparse.Namespace(assetdir=self.assetdir, jobs=1, sharpen_atlas=False, force=False,
+                                  cache=None, sizes=None, webp=False, dedup=False)
+        for key, value in options.items():
+            setattr(args, key, value)
+        Extractor(args).extract(outdir=self.outdir)
+
+    def _icon(self, name):
+        path = os.path.split(name)
+        return Image.open(os.path.join(self.outdir, os.path.split(path[0])[1], path[1]))
+
+    def test_matches_legacy(self):
+        """
+        Verify the icons are pixel-identical to the per-pixel construction.
+        """
+        self._extract()
+        for name, uvs, channel in SPRITES[:3]:
+            icon = self._icon(name)
+            self.assertEqual(icon.mode, 'LA')
+            self.assertEqual(list(icon.getdata()),
+                             list(_legacy_icon(self.atlas, uvs, channel).getdata()))
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'cursors')))
+
+    def test_sharpen_atlas(self):
+        """
+        Verify sharpening the whole atlas only differs slightly from sharpening
+        each icon, the differences being due to pixels outside the icon.
+        """
+        self._extract(sharpen_atlas=True)
+        for name, uvs, channel in SPRITES[:3]:
+            icon = list(self._icon(name).getdata())
+            legacy = list(_legacy_icon(self.atlas, uvs, channel).getdata())
+            self.assertEqual(len(icon), len(legacy))
+            for pixel in icon:
+                self.assertEqual(pixel[0], pixel[1])
+            difference = sum(abs(new[0] - old[0]) for new, old in zip(icon, legacy)) / len(icon)
+            self.assertLess(difference, 8)
+
+    def test_parallel(self):
+        """
+        Verify icons extracted by worker processes match the serial ones.
+        """
+        for sharpen_atlas in (False, True):
+            self._extract(sharpen_atlas=sharpen_atlas)
+            serial = {name: list(self._icon(name).getdata()) for name, _, _ in SPRITES[:3]}
+            self._extract(jobs=2, sharpen_atlas=sharpen_atlas)
+            for name, _, _ in SPRITES[:3]:
+                self.assertEqual(list(self._icon(name).getdata()), serial[name])
+
+    def test_parallel_unavailable(self):
+        """
+        Verify icons are extracted serially where shared memory is missing.
+        """
+        real_import = builtins.__import__
+
+        def _import(name, globals=None, locals=None, fromlist=(), level=0):  # pylint: disable=redefined-builtin
+            if name == 'multiprocessing' and 'shared_memory' in (fromlist or ()):
+                raise ImportError('No module named multiprocessing.shared_memory')
+            return real_import(name, globals, locals, fromlist, level)
+
+        self._extract()
+        serial = {name: list(self._icon(name).getdata()) for name, _, _ in SPRITES[:3]}
+        with mock.patch('builtins.__import__', _import), \
+                self.assertLogs('blrecipe.clt.extract', 'WARNING'):
+            self._extract(jobs=2, force=True)
+        for name, _, _ in SPRITES[:3]:
+            self.assertEqual(list(self._icon(name).getdata()), serial[name])
+
+    def test_incremental(self):
+        """
+        Verify only changed icons are rewritten and removed ones are deleted.
+        """
+        self._extract()
+        paths = {name: os.path.join(self.outdir, os.path.split(os.path.split(name)[0])[1],
+                                    os.path.split(name)[1])
+                 for name, _, _ in SPRITES[:3]}
+        for path in paths.values():
+            os.utime(path, ns=(0, 0))
+
+        # Change one pixel of the first sprite and drop the last sprite.
+        self.atlas.putpixel((10, 10), (0, 0, 0))
+        self.atlas.save(os.path.join(self.assetdir, 'gui', 'atlas.png'))
+        _write_atlas_index(os.path.join(self.assetdir, 'gui', 'atlas.msgpack'), SPRITES[:2])
+        self._extract()
+
+        self.assertNotEqual(os.stat(paths[SPRITES[0][0]]).st_mtime_ns, 0)
+        self.assertEqual(os.stat(paths[SPRITES[1][0]]).st_mtime_ns, 0)
+        self.assertFalse(os.path.exists(paths[SPRITES[2][0]]))
+
+        self._extract(force=True)
+        self.assertNotEqual(os.stat(paths[SPRITES[1][0]]).st_mtime_ns, 0)
+
+    def test_cache(self):
+        """
+        Verify extracting through the atlas cache gives the same icons and
+        reuses the cache for a source file that was only touched.
+        """
+        cachedir = os.path.join(self._tmpdir.name, 'cache')
+        self._extract(cache=cachedir)
+        self._extract(cache=cachedir, force=True)
+        for name, uvs, channel in SPRITES[:3]:
+            self.assertEqual(list(self._icon(name).getdata()),
+                             list(_legacy_icon(self.atlas, uvs, channel).getdata()))
+
+        pixels = os.path.join(cachedir, 'atlas.raw')
+        os.utime(pixels, ns=(0, 0))
+        os.utime(os.path.join(self.assetdir, 'gui', 'atlas.png'))
+        self._extract(cache=cachedir)
+        self.assertEqual(os.stat(pixels).st_mtime_ns, 0)
+
+        self.atlas.putpixel((10, 10), (0, 0, 0))
+        self.atlas.save(os.path.join(self.assetdir, 'gui', 'atlas.png'))
+        self._extract(cache=cachedir)
+        self.assertNotEqual(os.stat(pixels).st_mtime_ns, 0)
+        self.assertEqual(list(self._icon(SPRITES[0][0]).getdata()),
+                         list(_legacy_icon(self.atlas, *SPRITES[0][1:]).getdata()))
+
+    def test_cache_damaged(self):
+        """
+        Verify missing, short or unreadable cached files are rebuilt.
+        """
+        cachedir = os.path.join(self._tmpdir.name, 'cache')
+        self._extract(cache=cachedir)
+        pixels = os.path.join(cachedir, 'atlas.raw')
+        index = os.path.join(cachedir, 'atlas-index.json')
+        size = os.path.getsize(pixels)
+        os.remove(pixels)
+        with open(index, 'w') as outfile:
+            outfile.write('{')
+        self._extract(cache=cachedir, force=True)
+        self.assertEqual(os.path.getsize(pixels), size)
+        with open(index) as infile:
+            self.assertEqual(len(json.load(infile)['sprites']), len(SPRITES))
+
+        with open(pixels, 'r+b') as outfile:
+            outfile.truncate(size // 2)
+        os.remove(index)
+        self._extract(cache=cachedir, force=True)
+        self.assertEqual(os.path.getsize(pixels), size)
+        for name, uvs, channel in SPRITES[:3]:
+            self.assertEqual(list(self._icon(name).getdata()),
+                             list(_legacy_icon(self.atlas, uvs, channel).getdata()))
+
+    def test_sizes(self):
+        """
+        Verify scaled and WebP copies are written and dropped with their options.
+        """
+        self._extract(sizes=[48, 12], webp=True)
+        for name, uvs, _ in SPRITES[:3]:
+            category, filename = os.path.split(name)
+            category = os.path.split(category)[1]
+            stem = os.path.splitext(filename)[0]
+            native = self._icon(name)
+            webp = Image.open(os.path.join(self.outdir, category, stem + '.webp'))
+            self.assertEqual(list(webp.convert('LA').getdata()), list(native.getdata()))
+            for size in (12, 48):
+                for ext in ('.png', '.webp'):
+                    icon = Image.open(os.path.join(self.outdir, '{}px'.format(size), category,
+                                                   stem + ext))
+                    self.assertEqual(max(icon.size), size)
+                    self.assertEqual(icon.size[0] >= icon.size[1], uvs[2] >= uvs[3])
+
+        self._extract(sizes=[48])
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, '48px', 'items', 'WOOD.png')))
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, '12px', 'items', 'WOOD.png')))
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'items', 'WOOD.webp')))
+
+    def test_dedup(self):
+        """
+        Verify identical icons are stored once and linked from their paths.
+        """
+        sprites = SPRITES + [('gui/icons/items/WOOD_VARIANT.png', [4, 4, 24, 24], 0)]
+        _write_atlas_index(os.path.join(self.assetdir, 'gui', 'atlas.msgpack'), sprites)
+        self._extract(dedup=True)
+
+        with open(os.path.join(self.outdir, 'index.json')) as infile:
+            index = json.load(infile)
+        self.assertEqual(sorted(index), ['blocks/GLEAM.png', 'blocks/ROCK.png',
+                                         'items/WOOD.png', 'items/WOOD_VARIANT.png'])
+        self.assertEqual(len(set(index.values())), 3)
+        self.assertEqual(index['items/WOOD.png'], index['items/WOOD_VARIANT.png'])
+        for name, objname in index.items():
+            self.assertTrue(os.path.samefile(os.path.join(self.outdir, name),
+                                             os.path.join(self.outdir, objname)))
+        for name, uvs, channel in sprites[:3]:
+            self.assertEqual(list(self._icon(name).getdata()),
+                             list(_legacy_icon(self.atlas, uvs, channel).getdata()))
+
+        self._extract()
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'index.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'objects')))
+        self.assertFalse(os.path.samefile(os.path.join(self.outdir, 'items', 'WOOD.png'),
+                                          os.path.join(self.outdir, 'items', 'WOOD_VARIANT.png')))
+        self.assertEqual(list(self._icon(sprites[0][0]).getdata()),
+                         list(_legacy_icon(self.atlas, *sprites[0][1:]).getdata()))
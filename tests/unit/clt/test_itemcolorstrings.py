@@ -0,0 +1,126 @@
+"""
+Test the itemcolorstrings submodule
+"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from blrecipe.clt.itemcolorstrings import ObjectNames, StringTable, decode_language
+from benchmarks.encoders import encode_itemcolorstrings, encode_string_table
+
+
+LANGUAGES = {
+    'english': {'subtitles': ['', 'Rock', 'Refined Gem'],
+                'colours': ['Black', 'Deep Blue'],
+                'metals': ['Copper', 'Iron', 'Gold'],
+                'items': ['Stone', 'Gleam Block', 'Refined Gleam Block', 'Stone']},
+    'french': {'subtitles': ['', 'Roche', 'Gemme Raffinee'],
+               'colours': ['Noir', 'Bleu Profond'],
+               'metals': ['Cuivre', 'Fer', 'Or'],
+               'items': ['Pierre', 'Bloc Lueur', 'Bloc Lueur Raffine', 'Pierre']},
+}
+
+ITEMS = [(1000, 1), (1001, 0), (1002, 2), (1003, 1)]
+
+# Enough distinct words for word indexes of each variable-length size (3, 6
+# and 10 bits), and word and encoding offsets that are not byte-aligned
+WORDS = ['w{}{}'.format(i, 'x' * (i % 5)) for i in range(300)]
+NAMES = [''] + [' '.join(WORDS[(i * 7 + j) % 300] for j in range(i % 12 + 1))
+                for i in range(200)]
+
+
+class TestStringTable(TestCase):
+    """
+    Validate the bit-packed string table decoding
+    """
+
+    def test_names(self):
+        """
+        Verify every name is decoded, with words of every index size.
+        """
+        data = encode_string_table(NAMES, 0)
+        table = StringTable(data, 0, len(NAMES))
+        self.assertEqual([table.name(i) for i in range(len(NAMES))], NAMES)
+        self.assertEqual(table.name(5), NAMES[5])
+
+    def test_offset(self):
+        """
+        Verify a table is decoded from its offset in a larger file.
+        """
+        data = b'\xff' * 37 + encode_string_table(NAMES, 37)
+        table = StringTable(data, 37, len(NAMES))
+        self.assertEqual([table.name(i) for i in reversed(range(len(NAMES)))],
+                         list(reversed(NAMES)))
+
+    def test_range(self):
+        """
+        Verify an index outside the table is refused.
+        """
+        table = StringTable(encode_string_table(NAMES, 0), 0, len(NAMES))
+        for index in (-1, len(NAMES)):
+            with self.assertRaises(IndexError):
+                table.name(index)
+
+
+class TestObjectNames(TestCase):
+    """
+    Validate decoding of the bit-packed itemcolorstrings.dat format
+    """
+
+    def setUp(self):
+        self._tmpdir = TemporaryDirectory()
+        self.filename = os.path.join(self._tmpdir.name, 'itemcolorstrings.dat')
+        with open(self.filename, 'wb') as outfile:
+            outfile.write(encode_itemcolorstrings(ITEMS, 3, LANGUAGES))
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_header(self):
+        """
+        Verify the item table, languages and counts are read.
+        """
+        with ObjectNames(self.filename) as object_names:
+            self.assertEqual(list(object_names.languages()), ['english', 'french'])
+            self.assertEqual(object_names.item_count(), 4)
+            self.assertEqual(object_names.metal_count(), 3)
+            self.assertEqual(object_names.subtitle_count(), 3)
+            self.assertEqual([object_names.item(i) for i in range(4)], ITEMS)
+
+    def test_names(self):
+        """
+        Verify every name of every language is decoded.
+        """
+        for language, tables in LANGUAGES.items():
+            metals, items, subtitles = decode_language(self.filename, language)
+            self.assertEqual(metals, tables['metals'])
+            self.assertEqual(items, tables['items'])
+            self.assertEqual(subtitles, tables['subtitles'])
+            with ObjectNames(self.filename) as object_names:
+                translation = object_names.translation(language)
+                self.assertEqual(translation.colour(1), tables['colours'][1])
+                with self.assertRaises(IndexError):
+                    translation.item(4)
+
+    def test_translation_cache(self):
+        """
+        Verify a translation is decoded once until it is released.
+        """
+        with ObjectNames(self.filename) as object_names:
+            english = object_names.translation('english')
+            self.assertIs(object_names.translation('english'), english)
+            self.assertIsNot(object_names.translation('french'), english)
+            object_names.release('english')
+            self.assertIsNot(object_names.translation('english'), english)
+            self.assertEqual(object_names.translation('english').item(1), 'Gleam Block')
+            french = object_names.translation('french')
+            object_names.release()
+            self.assertIsNot(object_names.translation('french'), french)
+
+    def test_close(self):
+        """
+        Verify the file is unmapped when closed.
+        """
+        with ObjectNames(self.filename) as object_names:
+            translation = object_names.translation('english')
+        with self.assertRaises(ValueError):
+            translation.metal(0)
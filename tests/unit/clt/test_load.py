@@ -0,0 +1,354 @@
+"""
+Test the load submodule
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+from blrecipe.clt import load
+from blrecipe.clt.load import Loader, scan_asset_tree, load_asset_index
+from blrecipe.storage import Database, Ingredient, IngredientGroup, Item, ItemName, ItemUse
+from blrecipe.storage import Language
+from blrecipe.storage import CatalogSnapshot, Recipe, RecipeQuantity, RecordHash, SourceFile
+from blrecipe.storage import Translation
+from benchmarks.encoders import encode_itemcolorstrings, pack_keyed
+
+
+class TestAssetIndex(TestCase):
+    """
+    Validate the single-pass asset tree index
+    """
+
+    def setUp(self):
+        self._tmpdir = TemporaryDirectory()
+        self.assetdir = self._tmpdir.name
+        for path in (('recipes.msgpack',),
+                     ('archetypes', 'compileditems.msgpack'),
+                     ('deep', 'er', 'recipes.msgpack')):
+            filename = os.path.join(self.assetdir, *path)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            open(filename, 'w').close()
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_scan(self):
+        """
+        Verify every file is indexed and the shallowest match comes first.
+        """
+        index = scan_asset_tree(self.assetdir)
+        self.assertEqual(index['compileditems.msgpack'],
+                         [os.path.join(self.assetdir, 'archetypes', 'compileditems.msgpack')])
+        self.assertEqual(index['recipes.msgpack'],
+                         [os.path.join(self.assetdir, 'recipes.msgpack'),
+                          os.path.join(self.assetdir, 'deep', 'er', 'recipes.msgpack')])
+
+    def test_cached(self):
+        """
+        Verify a persisted index is reused until the asset directory changes.
+        """
+        with TemporaryDirectory() as cachedir:
+            cache_file = os.path.join(cachedir, 'index.json')
+            first = load_asset_index(self.assetdir, cache_file)
+            self.assertEqual(load_asset_index(self.assetdir, cache_file), first)
+
+            open(os.path.join(self.assetdir, 'english.json'), 'w').close()
+            os.utime(self.assetdir, ns=(0, 0))
+            self.assertIn('english.json', load_asset_index(self.assetdir, cache_file))
+
+    def test_cached_subdirectory(self):
+        """
+        Verify a persisted index is rescanned when a nested directory changes.
+        """
+        with TemporaryDirectory() as cachedir:
+            cache_file = os.path.join(cachedir, 'index.json')
+            load_asset_index(self.assetdir, cache_file)
+            nested = os.path.join(self.assetdir, 'deep', 'er')
+            open(os.path.join(nested, 'english.json'), 'w').close()
+            os.utime(nested, ns=(0, 0))
+            self.assertEqual(load_asset_index(self.assetdir, cache_file)['english.json'],
+                             [os.path.join(nested, 'english.json')])
+
+    def test_symlinked_directory(self):
+        """
+        Verify symbolic links to directories are followed, but only once.
+        """
+        with TemporaryDirectory() as linked:
+            open(os.path.join(linked, 'english.json'), 'w').close()
+            os.symlink(linked, os.path.join(self.assetdir, 'lang'))
+            os.symlink(self.assetdir, os.path.join(self.assetdir, 'deep', 'loop'))
+            index = scan_asset_tree(self.assetdir)
+        self.assertEqual(index['english.json'],
+                         [os.path.join(self.assetdir, 'lang', 'english.json')])
+        self.assertEqual(len(index['compileditems.msgpack']), 1)
+
+
+LANGUAGES = {
+    language: {'subtitles': ['', '{} rock'.format(language)],
+               'colours': ['{} black'.format(language)],
+               'metals': ['{} copper'.format(language)],
+               'items': ['{} stone'.format(language), '{} gleam'.format(language)]}
+    for language in ('english', 'french', 'german')
+}
+
+ITEM_IDS = list(range(1000, 1012))
+
+
+def _item(item_id):
+    return {'id': item_id, 'name': 'ITEM_{}'.format(item_id),
+            'stringID': 'ITEM_TYPE_{}'.format(item_id),
+            'coinValue': item_id % 7, 'listTypeName': 'LIST_TYPE_ROCK'}
+
+
+def _recipe(item_id):
+    return {'outputItem': item_id,
+            'outputQuantity': [1, 9, 90],
+            'machine': 'WORKBENCH',
+            'spark': [10, 90, 900],
+            'wear': [1, 2, 3],
+            'duration': [5, 45, 450],
+            'inputs': [{'inputItems': [item_id - 2], 'inputQuantity': [2, 18, 180]},
+                       {'groupId': 'GROUP_ROCK', 'inputQuantity': [1, 9, 90]}]}
+
+
+class TestLoader(TestCase):
+    """
+    Validate loading game files into the database
+    """
+
+    def setUp(self):
+        self._tmpdir = TemporaryDirectory()
+        self.assetdir = os.path.join(self._tmpdir.name, 'assets')
+        os.makedirs(self.assetdir)
+        self.database = 'sqlite:///' + os.path.join(self._tmpdir.name, 'test.db')
+        with open(os.path.join(self.assetdir, 'itemcolorstrings.dat'), 'wb') as outfile:
+            outfile.write(encode_itemcolorstrings([(1000, 1), (1001, 0)], 1, LANGUAGES))
+        self._write_archetypes(ITEM_IDS)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def _write_archetypes(self, item_ids):
+        pack_keyed({'ITEM_{}'.format(item_id): _item(item_id) for item_id in item_ids},
+                   os.path.join(self.assetdir, 'compileditems.msgpack'))
+        pack_keyed({'BlockTypesData': [{'id': item_id, 'prestige': item_id % 100,
+                                        'buildXP': 3, 'mineXP': 4}
+                                       for item_id in ITEM_IDS[:4]]},
+                   os.path.join(self.assetdir, 'compiledblocks.msgpack'))
+        pack_keyed({'groups': [{'groupName': 'GROUP_ROCK', 'groupMembers': [1000, 1001]}],
+                    'recipes': [_recipe(item_id) for item_id in ITEM_IDS[2:]]},
+                   os.path.join(self.assetdir, 'recipes.msgpack'))
+
+    def _write_translations(self, text, packed):
+        with open(os.path.join(self.assetdir, 'english.json'), 'w') as outfile:
+            json.dump(text, outfile)
+        pack_keyed(packed, os.path.join(self.assetdir, 'english.msgpack'))
+
+    def _translations(self):
+        database = Database(self.database)
+        session = database.session()
+        rows = [(translation.string_id, translation.value)
+                for translation in session.query(Translation)
+                .filter(Translation.string_id.like('TEST_%'))
+                .order_by(Translation.string_id)]
+        database.close()
+        return rows
+
+    def _load(self, jobs=1, stderr=None):
+        args = argparse.Namespace(assetdir=self.assetdir, release='test', asset_index=None,
+                                  report=None, trace_memory=False, jobs=jobs,
+                                  database=self.database, db_profile=None)
+        loader = Loader(args)
+        with contextlib.redirect_stderr(stderr or io.StringIO()):
+            loader.load_files()
+        return loader
+
+    def _counts(self):
+        database = Database(self.database)
+        session = database.session()
+        counts = {model.__name__: session.query(model).count()
+                  for model in (Item, ItemName, Recipe, Ingredient, RecipeQuantity,
+                                IngredientGroup, ItemUse)}
+        counts['prestige'] = sum(prestige for (prestige,) in session.query(Item.prestige))
+        database.close()
+        return counts
+
+    def test_removed_item(self):
+        """
+        Verify the rows referring to a removed item go with it, and come
+        back with it, while the other files are unchanged.
+        """
+        self._load()
+        loaded = self._counts()
+
+        self._write_archetypes([item_id for item_id in ITEM_IDS if item_id not in (1000, 1003)])
+        self._load()
+        database = Database(self.database)
+        session = database.session()
+        self.assertEqual(session.query(Recipe).filter_by(item_id=1003).count(), 0)
+        self.assertEqual(session.query(Ingredient)
+                         .filter(Ingredient.item_id.in_([1000, 1003])).count(), 0)
+        self.assertEqual(session.query(Ingredient)
+                         .filter_by(item_id=None, group_name=None).count(), 0)
+        self.assertEqual(session.query(IngredientGroup).filter_by(item_id=1000).count(), 0)
+        self.assertEqual(session.query(ItemName).filter_by(item_id=1000).count(), 0)
+        self.assertIsNone(CatalogSnapshot(session).item(1000))
+        database.close()
+        removed = self._counts()
+        self._load()
+        self.assertEqual(self._counts(), removed)
+
+        self._write_archetypes(ITEM_IDS)
+        self._load()
+        self.assertEqual(self._counts(), loaded)
+
+    def test_changed(self):
+        """
+        Verify a changed item and a changed recipe are updated in place.
+        """
+        self._load()
+        loaded = self._counts()
+        items = {'ITEM_{}'.format(item_id): _item(item_id) for item_id in ITEM_IDS}
+        items['ITEM_1005']['coinValue'] = 99
+        recipes = [_recipe(item_id) for item_id in ITEM_IDS[2:]]
+        recipes[2]['spark'] = [11, 99, 999]
+        pack_keyed(items, os.path.join(self.assetdir, 'compileditems.msgpack'))
+        pack_keyed({'groups': [{'groupName': 'GROUP_ROCK', 'groupMembers': [1000, 1001]}],
+                    'recipes': recipes},
+                   os.path.join(self.assetdir, 'recipes.msgpack'))
+        self._load()
+        self.assertEqual(self._counts(), loaded)
+        database = Database(self.database)
+        session = database.session()
+        self.assertEqual(session.query(Item.coin_value).filter_by(id=1005).scalar(), 99)
+        recipe = session.query(Recipe).filter_by(item_id=1004).one()
+        self.assertEqual(sorted(quantity.spark for quantity in recipe.quantities), [11, 99, 999])
+        database.close()
+
+    def test_unchanged(self):
+        """
+        Verify unchanged files are not loaded again, nor the item uses indexed.
+        """
+        self._write_translations({'TEST_A': 'text a'}, {'TEST_B': 'packed b'})
+        self._load()
+        handlers = ('_load_itemlist', '_load_object_names', '_load_translations',
+                    '_load_blocks', '_load_recipes')
+        with contextlib.ExitStack() as stack:
+            mocks = [stack.enter_context(mock.patch.object(Loader, name)) for name in handlers]
+            rebuild = stack.enter_context(mock.patch.object(load, 'rebuild_item_uses'))
+            self._load()
+        for handler in mocks:
+            handler.assert_not_called()
+        rebuild.assert_not_called()
+
+    def test_translations(self):
+        """
+        Verify a key in both translation files is loaded once, from the file
+        loaded first.
+        """
+        self._write_translations({'TEST_A': 'text a', 'TEST_B': 'text b'},
+                                 {'TEST_A': 'packed a', 'TEST_C': 'packed c'})
+        self._load()
+        self.assertEqual(self._translations(), [('TEST_A', 'text a'),
+                                                ('TEST_B', 'text b'),
+                                                ('TEST_C', 'packed c')])
+
+    def test_translations_reloaded(self):
+        """
+        Verify changed translations are updated and removed ones deleted.
+        """
+        self._write_translations({'TEST_A': 'text a', 'TEST_B': 'text b'},
+                                 {'TEST_C': 'packed c', 'TEST_D': 'packed d'})
+        self._load()
+        self._write_translations({'TEST_A': 'text a2'},
+                                 {'TEST_C': 'packed c', 'TEST_D': 'packed d2'})
+        self._load()
+        self.assertEqual(self._translations(), [('TEST_A', 'text a2'),
+                                                ('TEST_C', 'packed c'),
+                                                ('TEST_D', 'packed d2')])
+
+    def test_translation_moved(self):
+        """
+        Verify a key moving from one translation file to another is kept.
+        """
+        self._write_translations({'TEST_A': 'text a'}, {'TEST_B': 'packed b'})
+        self._load()
+        self._write_translations({'TEST_A': 'text a', 'TEST_B': 'text b'}, {})
+        self._load()
+        self.assertEqual(self._translations(), [('TEST_A', 'text a'), ('TEST_B', 'text b')])
+
+    def test_telemetry_printed(self):
+        """
+        Verify the telemetry summary is printed to stderr, leaving stdout alone.
+        """
+        errors = io.StringIO()
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self._load(stderr=errors)
+        self.assertEqual(output.getvalue(), '')
+        self.assertIn('recipes', errors.getvalue())
+
+    def test_reload_without_hashes(self):
+        """
+        Verify a database holding rows but no load state is not duplicated.
+        """
+        self._load()
+        loaded = self._counts()
+        self.assertEqual(loaded['Recipe'], 10)
+        database = Database(self.database)
+        session = database.session()
+        session.query(SourceFile).delete()
+        session.query(RecordHash).delete()
+        session.commit()
+        database.close()
+        self._load()
+        self.assertEqual(self._counts(), loaded)
+
+    def test_interrupted(self):
+        """
+        Verify a load interrupted after some batches of recipes resumes.
+        """
+        self._load()
+        loaded = self._counts()
+        database = Database(self.database)
+        session = database.session()
+        session.query(SourceFile).filter_by(name='recipes.msgpack').delete()
+        session.query(RecordHash).delete()
+        session.commit()
+        database.close()
+
+        add_recipe = Loader._add_recipe  # pylint: disable=protected-access
+        added = []
+
+        def failing(loader, recipe, output_item):
+            if len(added) == 5:
+                raise RuntimeError('interrupted')
+            added.append(recipe)
+            return add_recipe(loader, recipe, output_item)
+
+        with mock.patch.object(load, 'RECIPE_BATCH_SIZE', 2), \
+                mock.patch.object(Loader, '_add_recipe', failing):
+            with self.assertRaises(RuntimeError):
+                self._load()
+        self._load()
+        self.assertEqual(self._counts(), loaded)
+
+    def test_object_names(self):
+        """
+        Verify the names of every language are loaded, whether the languages
+        are decoded in worker processes or not.
+        """
+        for jobs in (1, 2):
+            self.database = 'sqlite:///' + os.path.join(self._tmpdir.name, 'jobs{}.db'.format(jobs))
+            session = self._load(jobs)._session  # pylint: disable=protected-access
+            self.assertEqual(sorted(name for (name,) in session.query(Language.name)),
+                             sorted(LANGUAGES))
+            names = {(name.lang, name.item_id): (name.name, name.subtitle)
+                     for name in session.query(ItemName)}
+            self.assertEqual(len(names), 6)
+            for language in LANGUAGES:
+                self.assertEqual(names[(language, 1000)],
+                                 ('{} stone'.format(language), '{} rock'.format(language)))
+                self.assertEqual(names[(language, 1001)], ('{} gleam'.format(language), ''))
@@ -0,0 +1,61 @@
+"""
+Test the key-table msgpack decoder
+"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+import msgpack
+from blrecipe.clt.msgpackfile import unpack, iter_map, iter_array
+
+
+# Data as stored in the game files: every map key indexes KEYS
+PACKED_DATA = {
+    0: {2: [{3: b'WOOD', 4: 1}, {3: b'ROCK', 4: 2}]},
+    1: [None, {4: 7, 5: {3: b'nested'}}],
+}
+KEYS = [b'items', b'blocks', b'list', b'name', b'id', b'extra']
+
+
+class TestMsgpackFile(TestCase):
+    """
+    Validate decoding of the game's key-table msgpack files
+    """
+
+    def setUp(self):
+        self._tmpdir = TemporaryDirectory()
+        self.filename = os.path.join(self._tmpdir.name, 'test.msgpack')
+        with open(self.filename, 'wb') as outfile:
+            msgpack.pack([PACKED_DATA, KEYS], outfile, use_bin_type=False)
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
+
+    def test_unpack(self):
+        """
+        Verify keys and strings are decoded throughout the structure.
+        """
+        self.assertEqual(unpack(self.filename), {
+            'items': {'list': [{'name': 'WOOD', 'id': 1}, {'name': 'ROCK', 'id': 2}]},
+            'blocks': [None, {'id': 7, 'extra': {'name': 'nested'}}],
+        })
+
+    def test_iter_map(self):
+        """
+        Verify a top-level map can be streamed.
+        """
+        self.assertEqual([key for key, _ in iter_map(self.filename)], ['items', 'blocks'])
+
+    def test_iter_array(self):
+        """
+        Verify a nested array can be streamed.
+        """
+        self.assertEqual(list(iter_array(self.filename, 'items', 'list')),
+                         [{'name': 'WOOD', 'id': 1}, {'name': 'ROCK', 'id': 2}])
+        self.assertEqual(list(iter_array(self.filename, 'blocks'))[0], None)
+
+    def test_missing_path(self):
+        """
+        Verify streaming a missing section raises KeyError.
+        """
+        with self.assertRaises(KeyError):
+            list(iter_array(self.filename, 'recipes'))
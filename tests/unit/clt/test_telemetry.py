@@ -0,0 +1,73 @@
+"""
+Test the load telemetry module
+"""
+import json
+import os
+import tracemalloc
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from sqlalchemy import create_engine
+from blrecipe.clt.telemetry import LoadTelemetry
+
+
+class TestLoadTelemetry(TestCase):
+    """
+    Validate the per-phase load telemetry
+    """
+
+    def test_phase(self):
+        """
+        Verify decode time, DB time and written rows are attributed to a phase.
+        """
+        connection = create_engine('sqlite://').connect()
+        connection.execute('CREATE TABLE t (x INTEGER)')
+        telemetry = LoadTelemetry(trace_memory=True)
+        telemetry.attach(connection)
+
+        with telemetry.phase('items') as stats:
+            values = list(telemetry.timed(iter([1, 2, 3])))
+            connection.execute('INSERT INTO t (x) VALUES (?)', [(value,) for value in values])
+            connection.execute('SELECT * FROM t').fetchall()
+
+        self.assertEqual(stats.rows, 3)
+        self.assertGreater(stats.wall_time, 0.0)
+        self.assertGreater(stats.db_time, 0.0)
+        self.assertGreater(stats.decode_time, 0.0)
+        self.assertIsNotNone(stats.peak_memory)
+        self.assertIn('items', telemetry.summary())
+
+    def test_caller_tracing(self):
+        """
+        Verify memory tracing started by the caller is left running.
+        """
+        telemetry = LoadTelemetry(trace_memory=True)
+        tracemalloc.start()
+        try:
+            with telemetry.phase('items') as stats:
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        self.assertIsNotNone(stats.peak_memory)
+        with telemetry.phase('blocks'):
+            self.assertTrue(tracemalloc.is_tracing())
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_report(self):
+        """
+        Verify the JSON report holds every phase.
+        """
+        telemetry = LoadTelemetry()
+        for name in ('items', 'blocks'):
+            with telemetry.phase(name):
+                pass
+
+        with TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'report.json')
+            telemetry.write_report(filename, release='249')
+            with open(filename) as infile:
+                report = json.load(infile)
+
+        self.assertEqual(report['release'], '249')
+        self.assertEqual([phase['phase'] for phase in report['phases']], ['items', 'blocks'])
+        self.assertIsNone(report['phases'][0]['peak_memory'])
@@ -0,0 +1,39 @@
+"""
+Test the crafting tree printing
+"""
+from unittest import TestCase
+from blrecipe.clt.tree import format_tree
+from blrecipe.storage import CraftingNode
+
+
+class TestFormatTree(TestCase):
+    """
+    Validate the layout of crafting trees
+    """
+
+    def setUp(self):
+        recipe = type('Recipe', (), {'machine': None})()
+        ore = CraftingNode(group_name='ORE')
+        self.ingot = CraftingNode(group_name='INGOT', recipe=recipe, produces=2)
+        self.ingot.inputs = ((ore, 3),)
+        self.part = CraftingNode(group_name='PART', recipe=recipe)
+        self.part.inputs = ((self.ingot, 1), (self.ingot, 4))
+
+    def test_shared(self):
+        """
+        Verify that a shared sub-tree is only expanded once.
+        """
+        self.assertEqual(format_tree(self.part, 2),
+                         ['2 PART (2 x hand)',
+                          '    2 INGOT (1 x hand)',
+                          '        3 ORE',
+                          '    8 INGOT (4 x hand) ...'])
+
+    def test_depth(self):
+        """
+        Verify that the tree stops at the depth asked for.
+        """
+        self.assertEqual(format_tree(self.part, 1, depth=1),
+                         ['1 PART (1 x hand)',
+                          '    1 INGOT (1 x hand)',
+                          '    4 INGOT (2 x hand)'])
@@ -0,0 +1,99 @@
+"""
+Test the crafting tree expansion
+"""
+from unittest import TestCase
+from blrecipe.storage import CatalogSnapshot, CraftingTrees, Database, Ingredient
+from blrecipe.storage import IngredientGroup, Item, ItemName, Quantity, Recipe, RecipeQuantity
+from blrecipe.storage import QUANTITY_TIERS
+
+# Output item: (amount produced, [(ingredient item or group, amount)])
+RECIPES = {
+    2: (1, [(1, 2)]),                           # ingot: 2 ore
+    3: (2, [(2, 3)]),                           # plate: 3 ingots
+    4: (1, [(3, 1), (2, 1), ('GROUP_ROCK', 1)]),  # part: a plate, an ingot and a rock
+    5: (1, [(6, 1)]),                           # 5 and 6 are made from each other
+    6: (1, [(5, 1), (1, 1)]),
+    7: (1, [(3, 1), (4, 1)]),                   # assembly: a plate and a part
+}
+
+
+class TestCraftingTrees(TestCase):
+    """
+    Validate the expansion of items into their ingredients
+    """
+
+    def setUp(self):
+        self.database = Database(profile='memory')
+        session = self.database.session()
+        single = session.query(Quantity).filter_by(quantity_id=QUANTITY_TIERS['single']).one()
+        for item_id in range(1, 9):
+            session.add(Item(id=item_id, string_id='ITEM_TYPE_{}'.format(item_id)))
+            session.add(ItemName(item_id, name='item {}'.format(item_id)))
+        session.add_all([IngredientGroup('GROUP_ROCK', 1), IngredientGroup('GROUP_ROCK', 8)])
+        for item_id, (produces, inputs) in sorted(RECIPES.items()):
+            recipe = Recipe(item_id=item_id)
+            session.add(recipe)
+            RecipeQuantity(recipe, single, produces=produces)
+            for source, amount in inputs:
+                if isinstance(source, str):
+                    session.add(Ingredient(recipe=recipe, group_name=source,
+                                           quantity=single, amount=amount))
+                else:
+                    session.add(Ingredient(recipe=recipe, item_id=source,
+                                           quantity=single, amount=amount))
+        session.commit()
+        self.snapshot = CatalogSnapshot(session)
+        self.trees = CraftingTrees(self.snapshot)
+
+    def tearDown(self):
+        self.database.close()
+
+    def _raw(self, item_id, amount=1, trees=None):
+        trees = self.trees if trees is None else trees
+        return [(node.name, needed)
+                for node, needed in trees.raw_materials(self.snapshot.item(item_id), amount)]
+
+    def test_expand(self):
+        """
+        Verify that items expand down to raw materials.
+        """
+        self.assertEqual(self._raw(1), [('item 1', 1)])
+        self.assertEqual(self._raw(2, 3), [('item 1', 6)])
+        self.assertEqual(self._raw(4), [('GROUP_ROCK', 1), ('item 1', 8)])
+
+    def test_batches(self):
+        """
+        Verify that an item is crafted once for all of its uses, in whole
+        batches.
+        """
+        self.assertEqual(self._raw(3, 3), [('item 1', 12)])
+        # The plates for the assembly and its part come from a single craft
+        expanded = {node.name: needed
+                    for node, needed in self.trees.expand(self.snapshot.item(7))}
+        self.assertEqual(expanded, {'item 7': 1, 'item 4': 1, 'item 3': 2, 'item 2': 4,
+                                    'item 1': 8, 'GROUP_ROCK': 1})
+
+    def test_order(self):
+        """
+        Verify that every product comes before its ingredients.
+        """
+        for node in self.trees.order:
+            for source, _ in node.inputs:
+                self.assertLess(node.index, source.index)
+        self.assertIs(self.trees.node(self.snapshot.item(2)),
+                      self.trees.node(self.snapshot.item(3)).inputs[0][0])
+
+    def test_cycles(self):
+        """
+        Verify that a cycle is cut and its closing item taken as raw.
+        """
+        self.assertEqual([[item.id for item in cycle] for cycle in self.trees.cycles], [[5, 6]])
+        self.assertEqual(self._raw(5), [('item 1', 1), ('item 5', 1)])
+
+    def test_tiers(self):
+        """
+        Verify that items without a recipe in a tier are raw in that tier.
+        """
+        bulk = CraftingTrees(self.snapshot, QUANTITY_TIERS['bulk'])
+        self.assertEqual(self._raw(4, 2, bulk), [('item 4', 2)])
+        self.assertEqual(bulk.order, [])
@@ -0,0 +1,180 @@
+"""
+Test the Database engine configuration
+"""
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, mock
+from sqlalchemy.exc import OperationalError
+from blrecipe.storage import Database, Machine
+from blrecipe.storage.database import PROFILE_VARIABLE, URL_VARIABLE
+
+
+class TestDatabase(TestCase):
+    """
+    Validate the choice of database and profile
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.url = 'sqlite:///' + os.path.join(self.tmpdir, 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _pragma(self, database, name):
+        return database.session().execute('PRAGMA {}'.format(name)).scalar()
+
+    def test_environment(self):
+        """
+        Verify that the database and profile default to the environment.
+        """
+        with mock.patch.dict(os.environ, {URL_VARIABLE: self.url, PROFILE_VARIABLE: 'bulk-load'}):
+            database = Database()
+        self.assertEqual(database.url, self.url)
+        self.assertEqual(database.profile, 'bulk-load')
+        database.close()
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, 'test.db')))
+
+    def test_unknown_profile(self):
+        """
+        Verify that an unknown profile is refused.
+        """
+        with self.assertRaises(ValueError):
+            Database(self.url, 'no-such-profile')
+
+    def test_bulk_load(self):
+        """
+        Verify that the bulk-load profile syncs less but keeps the file safe.
+        """
+        database = Database(self.url, 'bulk-load')
+        self.assertEqual(self._pragma(database, 'journal_mode'), 'wal')
+        self.assertEqual(self._pragma(database, 'synchronous'), 1)
+        self.assertEqual(self._pragma(database, 'temp_store'), 2)
+        database.close()
+
+    def test_read_serving(self):
+        """
+        Verify that the read-serving profile opens a read-only WAL database.
+        """
+        Database(self.url).close()
+        database = Database(self.url, 'read-serving')
+        session = database.session()
+        self.assertEqual(self._pragma(database, 'journal_mode'), 'wal')
+        self.assertEqual(session.query(Machine).filter_by(name='EXTRACTOR').count(), 1)
+        session.add(Machine('TEST', 'TEST'))
+        with self.assertRaises(OperationalError):
+            session.flush()
+        database.close()
+
+    def test_memory(self):
+        """
+        Verify that each in-memory database is private and ready to use.
+        """
+        first = Database(self.url, 'memory')
+        session = first.session()
+        session.add(Machine('TEST', 'TEST'))
+        session.commit()
+        second = Database(profile='memory')
+        self.assertEqual(second.session().query(Machine).filter_by(name='TEST').count(), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, 'test.db')))
+        first.close()
+        second.close()
+
+
+class TestReaders(TestCase):
+    """
+    Validate the pooled read-only sessions
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.url = 'sqlite:///' + os.path.join(self.tmpdir, 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _query_in_threads(self, database, count):
+        """
+        Query the machines from several threads at once, each holding its
+        session open until all of them have queried.
+        """
+        readers = database.readers()
+        barrier = threading.Barrier(count)
+        results = [None] * count
+
+        def read(index):
+            session = readers()
+            names = [machine.name for machine in session.query(Machine).order_by(Machine.name)]
+            results[index] = (session, session.connection().connection.connection, names)
+            barrier.wait()
+            readers.remove()
+
+        threads = [threading.Thread(target=read, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def _assert_concurrent(self, database):
+        """
+        Assert that each thread queries through its own session and connection.
+        """
+        results = self._query_in_threads(database, 4)
+        self.assertEqual(len({id(session) for session, _, _ in results}), 4)
+        self.assertEqual(len({id(connection) for _, connection, _ in results}), 4)
+        for _, _, names in results:
+            self.assertIn('TEST', names)
+            self.assertIn('EXTRACTOR', names)
+
+    def test_concurrent(self):
+        """
+        Verify that readers of a database file query concurrently.
+        """
+        writer = Database(self.url)
+        session = writer.session()
+        session.add(Machine('TEST', 'TEST'))
+        session.commit()
+        writer.close()
+        for profile in ('default', 'read-serving'):
+            database = Database(self.url, profile)
+            self._assert_concurrent(database)
+            database.close()
+
+    def test_concurrent_memory(self):
+        """
+        Verify that readers of an in-memory database query concurrently.
+        """
+        database = Database(profile='memory')
+        session = database.session()
+        session.add(Machine('TEST', 'TEST'))
+        session.commit()
+        self._assert_concurrent(database)
+        database.close()
+
+    def test_read_only(self):
+        """
+        Verify that the readers cannot write.
+        """
+        database = Database(profile='memory')
+        readers = database.readers()
+        readers.add(Machine('TEST', 'TEST'))
+        with self.assertRaises(OperationalError):
+            readers.flush()
+        readers.remove()
+        database.close()
+
+    def test_scope(self):
+        """
+        Verify that a scope function selects the session.
+        """
+        scope = ['first']
+        database = Database(profile='memory')
+        readers = database.readers(scopefunc=lambda: scope[0])
+        first = readers()
+        self.assertIs(readers(), first)
+        scope[0] = 'second'
+        self.assertIsNot(readers(), first)
+        database.close()
@@ -0,0 +1,126 @@
+"""
+Test the storage indexes serve the hot lookups
+"""
+import re
+from unittest import TestCase
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, inspect
+from blrecipe.storage import Ingredient, IngredientGroup, ItemName, ItemUse, Recipe
+from blrecipe.storage import RecipeQuantity, ResourceTag, Translation
+from blrecipe.storage.database import BaseObject, Session, ensure_schema
+
+
+class TestQueryPlans(TestCase):
+    """
+    Validate none of the hot lookups is a full table scan
+    """
+
+    def setUp(self):
+        self._engine = create_engine('sqlite://')
+        self._connection = self._engine.connect()
+        BaseObject.metadata.create_all(self._connection)
+        self.session = Session(bind=self._connection)
+
+    def tearDown(self):
+        self.session.close()
+        self._connection.close()
+
+    def _plan(self, query):
+        """
+        Get the EXPLAIN QUERY PLAN details of an ORM query.
+        """
+        statement = query.statement.compile(self._engine, compile_kwargs={'literal_binds': True})
+        return [row[-1] for row in self._connection.execute('EXPLAIN QUERY PLAN {}'.format(statement))]
+
+    def assertSearches(self, query, table):  # pylint: disable=invalid-name
+        """
+        Assert a query looks up rows of a table through an index.
+        """
+        plan = self._plan(query)
+        scans = [detail for detail in plan
+                 if re.match(r'SCAN (TABLE )?{}\b'.format(table), detail)]
+        self.assertEqual(scans, [], plan)
+        self.assertTrue(any(re.match(r'SEARCH (TABLE )?{}\b'.format(table), detail)
+                            for detail in plan), plan)
+
+    def test_item_name(self):
+        """
+        Verify item names are found by (lang, name) and by item.
+        """
+        self.assertSearches(self.session.query(ItemName).filter_by(lang='english', name='Rock'),
+                            'ItemName')
+        self.assertSearches(self.session.query(ItemName).filter_by(item_id=1), 'ItemName')
+
+    def test_ingredient(self):
+        """
+        Verify ingredients are found by item, group and recipe.
+        """
+        self.assertSearches(self.session.query(Ingredient).filter_by(item_id=1), 'Ingredient')
+        self.assertSearches(self.session.query(Ingredient).filter_by(group_name='GROUP_ROCK'),
+                            'Ingredient')
+        self.assertSearches(self.session.query(Ingredient).filter_by(recipe_id=1), 'Ingredient')
+
+    def test_ingredient_group(self):
+        """
+        Verify ingredient groups are found by item and by name.
+        """
+        self.assertSearches(self.session.query(IngredientGroup).filter_by(item_id=1),
+                            'IngredientGroup')
+        self.assertSearches(self.session.query(IngredientGroup).filter_by(name='GROUP_ROCK'),
+                            'IngredientGroup')
+
+    def test_recipe(self):
+        """
+        Verify recipes and their quantities are found by item and recipe.
+        """
+        self.assertSearches(self.session.query(Recipe).filter_by(item_id=1), 'Recipe')
+        self.assertSearches(self.session.query(RecipeQuantity).filter_by(recipe_id=1),
+                            'ReciepQuantity')
+
+    def test_string_id(self):
+        """
+        Verify resource tags and translations are found by string ID alone.
+        """
+        self.assertSearches(self.session.query(ResourceTag).filter_by(string_id='ITEM_TYPE_ROCK'),
+                            'ResourceTag')
+        self.assertSearches(self.session.query(Translation).filter_by(string_id='GUI_TITLE'),
+                            'Translation')
+
+    def test_item_use(self):
+        """
+        Verify item uses are found by item.
+        """
+        self.assertSearches(self.session.query(ItemUse).filter_by(item_id=1), 'ItemUse')
+
+
+class TestMigration(TestCase):
+    """
+    Validate a database from an earlier version gains the indexes
+    """
+
+    def test_add_indexes(self):
+        """
+        Verify missing indexes are added to existing tables and kept data.
+        """
+        engine = create_engine('sqlite://')
+        connection = engine.connect()
+        metadata = MetaData()
+        Table('Recipe', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('item_id', Integer, nullable=False))
+        Table('Translation', metadata,
+              Column('id', Integer, primary_key=True),
+              Column('lang', String(32)),
+              Column('string_id', String(64)),
+              Column('value', String(255)))
+        metadata.create_all(connection)
+        connection.execute("INSERT INTO Recipe (id, item_id) VALUES (1, 1024)")
+
+        ensure_schema(connection)
+
+        insp = inspect(connection)
+        self.assertIn('ix_Recipe_item_id', {index['name'] for index in insp.get_indexes('Recipe')})
+        self.assertIn('ix_Translation_string_id',
+                      {index['name'] for index in insp.get_indexes('Translation')})
+        self.assertIn('ItemUse', insp.get_table_names())
+        self.assertEqual(list(connection.execute('SELECT item_id FROM Recipe')), [(1024,)])
+        connection.close()
@@ -0,0 +1,83 @@
+"""
+Test the ItemUse storage model
+"""
+from unittest import TestCase
+from sqlalchemy import create_engine
+from blrecipe.storage import Ingredient, IngredientGroup, Item, ItemName, ItemUse, Recipe
+from blrecipe.storage import all_item_uses, rebuild_item_uses
+from blrecipe.storage.database import BaseObject, Session, ensure_schema
+
+
+class TestItemUse(TestCase):
+    """
+    Validate the materialized Used In table
+    """
+
+    def setUp(self):
+        self._engine = create_engine('sqlite://')
+        self._connection = self._engine.connect()
+        BaseObject.metadata.create_all(self._connection)
+        self.session = Session(bind=self._connection)
+        for item_id in range(1, 6):
+            self.session.add(Item(id=item_id, string_id='ITEM_TYPE_{}'.format(item_id)))
+            if item_id != 5:
+                self.session.add(ItemName(item_id, name='item {}'.format(item_id)))
+        self.session.add_all([IngredientGroup('GROUP_ROCK', 1), IngredientGroup('GROUP_ROCK', 2)])
+        recipes = {output: Recipe(item_id=output) for output in (3, 4, 5)}
+        self.session.add_all(recipes.values())
+        self.session.flush()
+        for quantity_id in range(3):
+            self.session.add_all([
+                Ingredient(recipe_id=recipes[3].id, item_id=1, quantity_id=quantity_id),
+                Ingredient(recipe_id=recipes[3].id, group_name='GROUP_ROCK',
+                           quantity_id=quantity_id),
+                Ingredient(recipe_id=recipes[4].id, item_id=3, quantity_id=quantity_id),
+                Ingredient(recipe_id=recipes[5].id, item_id=3, quantity_id=quantity_id),
+            ])
+        rebuild_item_uses(self.session)
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self._connection.close()
+
+    def test_uses(self):
+        """
+        Verify direct and group ingredients are both expanded, once per recipe.
+        """
+        self.assertEqual(self.session.query(ItemUse).count(), 4)
+        items = {item.id: item for item in self.session.query(Item)}
+        self.assertEqual(items[1].uses, ['item 3'])
+        self.assertEqual(items[2].uses, ['item 3'])
+        self.assertEqual(items[3].uses, ['[[unknown]]', 'item 4'])
+        self.assertEqual(items[4].uses, [])
+
+    def test_all_uses(self):
+        """
+        Verify the bulk lookup matches the per-item one.
+        """
+        uses = all_item_uses(self.session)
+        self.assertEqual(uses, {item.id: item.uses
+                                for item in self.session.query(Item) if item.uses})
+
+    def test_rebuild(self):
+        """
+        Verify a rebuild replaces the previous contents.
+        """
+        self.session.query(Ingredient).filter_by(item_id=1).delete()
+        rebuild_item_uses(self.session)
+        self.assertEqual(self.session.query(ItemUse).count(), 4)
+        self.session.query(IngredientGroup).delete()
+        rebuild_item_uses(self.session)
+        self.assertEqual(self.session.query(ItemUse).count(), 2)
+        self.assertEqual(all_item_uses(self.session), {3: ['[[unknown]]', 'item 4']})
+
+    def test_migration(self):
+        """
+        Verify the uses are filled in when the table is added to a database
+        holding recipes.
+        """
+        ItemUse.__table__.drop(self._connection)
+        ensure_schema(self._connection)
+        self.assertEqual(self.session.query(ItemUse).count(), 4)
+        self.assertEqual(all_item_uses(self.session)[3], ['[[unknown]]', 'item 4'])
@@ -0,0 +1,37 @@
+"""
+Test the load state module
+"""
+from unittest import TestCase
+from blrecipe.storage import SourceFile, RecordHash
+
+
+class TestSourceFile(TestCase):
+    """
+    Validate the SourceFile table
+    """
+
+    def test_ctor(self):
+        """
+        Verify basic constructor
+        """
+        source = SourceFile('recipes.msgpack', 'abc123', release='249')
+
+        self.assertEqual(source.name, 'recipes.msgpack')
+        self.assertEqual(source.digest, 'abc123')
+        self.assertEqual(source.release, '249')
+
+
+class TestRecordHash(TestCase):
+    """
+    Validate the RecordHash table
+    """
+
+    def test_ctor(self):
+        """
+        Verify basic constructor
+        """
+        record = RecordHash('compileditems.msgpack', '1024', 'def456')
+
+        self.assertEqual(record.source, 'compileditems.msgpack')
+        self.assertEqual(record.key, '1024')
+        self.assertEqual(record.digest, 'def456')
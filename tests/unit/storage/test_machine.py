@@ -14,6 +14,6 @@ class TestMachine(TestCase):
         """
         Verify that a Workbench Machine exists in the table.
         """
-        session = Database().session()
+        session = Database(profile='memory').session()
         machine = session.query(Machine).filter_by(name='EXTRACTOR').first()
         self.assertTrue(machine.name == 'EXTRACTOR')
@@ -14,6 +14,6 @@ class TestQuantity(TestCase):
         """
         Verify that the Single quantity exists in the table.
         """
-        session = Database().session()
+        session = Database(profile='memory').session()
         query = session.query(Quantity).filter_by(string_id='GUI_MACHINE_CRAFT_TAB_SINGLE').first()
         self.assertTrue(query.string_id == 'GUI_MACHINE_CRAFT_TAB_SINGLE')
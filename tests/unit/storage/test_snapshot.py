@@ -0,0 +1,139 @@
+"""
+Test the catalogue snapshot
+"""
+import contextlib
+import io
+from unittest import TestCase
+from sqlalchemy import event
+from blrecipe.clt.recipe import print_item_wiki
+from blrecipe.storage import CatalogSnapshot, Database, Ingredient, IngredientGroup, Item
+from blrecipe.storage import ItemName, Machine, Quantity, Recipe, RecipeQuantity, ResourceTag
+from blrecipe.storage import Translation, rebuild_item_uses
+
+
+class TestCatalogSnapshot(TestCase):
+    """
+    Validate the snapshot renders like the storage models it was read from
+    """
+
+    def setUp(self):
+        self.database = Database(profile='memory')
+        session = self.database.session()
+        quantities = session.query(Quantity).order_by(Quantity.quantity_id).all()
+        furnace = session.query(Machine).filter_by(name='FURNACE').one()
+        for string_id, value in [('GUI_MACHINE_CRAFT_TAB_SINGLE', 'Single'),
+                                 ('GUI_MACHINE_CRAFT_TAB_BULK', 'Bulk'),
+                                 ('GUI_MACHINE_CRAFT_TAB_MASS', 'Mass'),
+                                 ('GUI_MACHINE_FURNACE_TITLE', 'Furnace'),
+                                 ('LIST_TYPE_ROCK', 'Rocks'),
+                                 ('ITEM_TYPE_10_DESCRIPTION', 'A $[STYLE(thing,1)]')]:
+            session.add(Translation(string_id, value=value))
+        session.add(Translation('ITEM_TYPE_9_DESCRIPTION', lang='french', value='Une chose'))
+        for item_id in range(1, 11):
+            session.add(Item(id=item_id, string_id='ITEM_TYPE_{}'.format(item_id),
+                             list_type_id='LIST_TYPE_ROCK' if item_id < 3 else None,
+                             coin_value=item_id))
+            for lang in ('english', 'french'):
+                session.add(ItemName(item_id, lang=lang, name='{} {}'.format(lang, item_id),
+                                     subtitle='{} subtitle'.format(lang)))
+        session.add(ResourceTag('ITEM_TYPE_1', 'HIGH', 'DEEP', 'ROCK'))
+        session.add_all([IngredientGroup('GROUP_ROCK', 1), IngredientGroup('GROUP_ROCK', 2)])
+        for item_id in range(3, 11):
+            recipe = Recipe(item_id=item_id, experience=item_id, heat=item_id,
+                            machine=furnace if item_id % 2 else None)
+            session.add(recipe)
+            for quantity in quantities:
+                RecipeQuantity(recipe, quantity, produces=quantity.quantity_id + 1,
+                               wear=1, duration=90)
+                for source in (item_id - 1, item_id - 2):
+                    session.add(Ingredient(recipe=recipe, item_id=source,
+                                           quantity=quantity, amount=2))
+                session.add(Ingredient(recipe=recipe, group_name='GROUP_ROCK',
+                                       quantity=quantity, amount=1))
+        session.flush()
+        rebuild_item_uses(session)
+        session.commit()
+        self.session = self.database.session()
+
+    def tearDown(self):
+        self.database.close()
+
+    def _render(self, item, tags):
+        text = io.StringIO()
+        with contextlib.redirect_stdout(text):
+            print_item_wiki(item, tags, print_infobox=True)
+        return text.getvalue()
+
+    def test_render(self):
+        """
+        Verify that every item renders the same from the snapshot.
+        """
+        snapshot = CatalogSnapshot(self.session)
+        for item in self.session.query(Item):
+            tags = self.session.query(ResourceTag).filter_by(string_id=item.string_id).first()
+            record = snapshot.item(item.id)
+            self.assertEqual(self._render(record, snapshot.resource_tag(record.string_id)),
+                             self._render(item, tags))
+
+    def test_lookup(self):
+        """
+        Verify that items are found by ID and localized name.
+        """
+        snapshot = CatalogSnapshot(self.session)
+        self.assertEqual(len(snapshot.items), 10)
+        self.assertEqual(len(snapshot.recipes), 8)
+        self.assertIs(snapshot.item_named('english 4'), snapshot.item(4))
+        self.assertIs(snapshot.item_named('french 4', language='french'), snapshot.item(4))
+        self.assertIsNone(snapshot.item_named('english 11'))
+        self.assertEqual(snapshot.item(9).description, 'Une chose')
+        self.assertEqual(snapshot.item(1).uses, ['english 10', 'english 3', 'english 4',
+                                                  'english 5', 'english 6', 'english 7',
+                                                  'english 8', 'english 9'])
+        self.assertEqual([item.id for item in snapshot.groups['GROUP_ROCK']], [1, 2])
+
+    def test_queries(self):
+        """
+        Verify that the snapshot is loaded in a fixed number of queries and
+        then used without any.
+        """
+        statements = []
+        connection = self.session.connection()
+        event.listen(connection, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+        snapshot = CatalogSnapshot(self.session)
+        loaded = len(statements)
+        self.assertLessEqual(loaded, 12)
+        for item in snapshot.items.values():
+            self._render(item, snapshot.resource_tag(item.string_id))
+        self.assertEqual(len(statements), loaded)
+
+    def test_missing_items(self):
+        """
+        Verify that recipes and ingredients of items that do not exist are
+        left out.
+        """
+        self.session.query(Item).filter(Item.id.in_([3, 10])).delete(synchronize_session=False)
+        snapshot = CatalogSnapshot(self.session)
+        self.assertEqual(len(snapshot.recipes), 6)
+        self.assertIsNone(snapshot.item(3))
+        recipe = snapshot.item(4).recipes[0]
+        self.assertEqual({ingredient.display_name for ingredient in recipe.ingredients},
+                         {'english 2', 'GROUP_ROCK'})
+        self.assertEqual(len(recipe.quantities), 3)
+
+    def test_shared_name(self):
+        """
+        Verify that a name given to several items finds the same item as
+        querying ItemName.
+        """
+        query = self.session.query(ItemName).filter(ItemName.item_id.in_([2, 9]),
+                                                    ItemName.lang == 'english')
+        query.delete(synchronize_session=False)
+        for item_id in (9, 2):
+            self.session.add(ItemName(item_id, lang='english', name='shared', subtitle=''))
+            self.session.flush()
+        self.session.commit()
+        snapshot = CatalogSnapshot(self.session)
+        first = self.session.query(ItemName).filter_by(lang='english', name='shared').first()
+        self.assertEqual(first.item_id, 9)
+        self.assertIs(snapshot.item_named('shared'), snapshot.item(9))